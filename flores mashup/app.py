@@ -1,30 +1,256 @@
+import time
+# Inicio de la importación, para el informe de arranque
+STARTUP_STARTED = time.perf_counter()
+
 import os
 import re
-import requests
-import mysql.connector
-from concurrent.futures import ThreadPoolExecutor
-from datetime import timedelta
+import atexit
+import io
+import gzip
+import hmac
+import json
+import hashlib
+import sqlite3
+import importlib
+import itertools
+import mimetypes
+import queue
+import threading
+from bisect import bisect_left
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from concurrent.futures import TimeoutError as FuturesTimeout
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urljoin, urlsplit
+
+import click
 
 from flask import (
     Flask, render_template, request, jsonify,
-    redirect, url_for, session, flash, g
+    redirect, url_for, session, flash, g,
+    Response, stream_with_context, send_file
 )
-from flask_bcrypt import Bcrypt
-from dotenv import load_dotenv
-import wikipediaapi
-from unidecode import unidecode
-from functools import wraps
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+
+from flask.json.provider import DefaultJSONProvider
+from flask.sessions import SecureCookieSessionInterface
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = ImageOps = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+
+class LazyModule:
+    """
+    Importa el módulo la primera vez que se usa uno de sus atributos. requests
+    y mysql.connector suman casi la mitad del tiempo de importación de la app
+    y los comandos de la CLI o un worker recién reciclado no siempre los usan.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
 
+requests = LazyModule('requests')
+mysql_connector = LazyModule('mysql.connector')
+flask_bcrypt = LazyModule('flask_bcrypt')
+unidecode = LazyModule('unidecode')
 
-load_dotenv()
+def find_env_file():
+    """Ruta del .env más cercano subiendo desde la carpeta de app.py (como load_dotenv())"""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        path = os.path.join(directory, '.env')
+        if os.path.isfile(path):
+            return path
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+# python-dotenv solo se importa si hay un .env; en producción las variables
+# suelen venir del entorno
+ENV_FILE = find_env_file()
+if ENV_FILE:
+    LazyModule('dotenv').load_dotenv(ENV_FILE)
 
 app = Flask(__name__, template_folder="templates", static_folder="static")
 
 
-app.secret_key = os.getenv("SECRET_KEY", "mondongo")
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Serializa con orjson: varias veces más rápido que json y sin escapar los
+    caracteres no ASCII. Mantiene las claves ordenadas (ETags estables) y el
+    modo con sangría en depuración usa el serializador estándar.
+    """
+
+    OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        if kwargs.get('indent'):
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self.OPTIONS).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self.OPTIONS | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+# 'orjson' (por defecto si está instalado) o 'stdlib' para volver al json de Flask
+JSON_ENCODER = os.getenv('JSON_ENCODER', 'orjson')
+if JSON_ENCODER == 'orjson' and orjson is not None:
+    app.json = FastJSONProvider(app)
+
+
+DEFAULT_SECRET_KEY = "mondongo"
+app.secret_key = os.getenv("SECRET_KEY", DEFAULT_SECRET_KEY)
 app.permanent_session_lifetime = timedelta(days=7)
 
-bcrypt = Bcrypt(app)
+# Factor de coste de bcrypt; los hashes con otro coste se recalculan al iniciar sesión
+app.config["BCRYPT_LOG_ROUNDS"] = int(os.getenv("BCRYPT_LOG_ROUNDS", 12))
+
+@lru_cache(maxsize=None)
+def get_bcrypt():
+    """Flask-Bcrypt de la app; se importa y se crea con el primer hash"""
+    return flask_bcrypt.Bcrypt(app)
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metrics:
+    """
+    Contadores, histogramas y gauges en memoria del proceso, exportados en el
+    formato de texto de Prometheus por /metrics. Los gauges se calculan al
+    exportar a partir de una función que devuelve {etiquetas: valor}.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._meta = {}
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name, help_text):
+        self._meta[name] = ('counter', help_text)
+        self._counters[name] = {}
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self._meta[name] = ('histogram', help_text)
+        self._histograms[name] = (buckets, {})
+
+    def gauge(self, name, help_text, collect):
+        self._meta[name] = ('gauge', help_text)
+        self._gauges[name] = collect
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        buckets, series = self._histograms[name]
+        with self._lock:
+            counts = series.get(key)
+            if counts is None:
+                counts = series[key] = [0] * len(buckets) + [0, 0.0]
+            position = bisect_left(buckets, value)
+            if position < len(buckets):
+                counts[position] += 1
+            counts[-2] += 1
+            counts[-1] += value
+
+    @staticmethod
+    def _labels(pairs):
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+    def render(self):
+        lines = []
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {
+                name: (buckets, {key: list(counts) for key, counts in series.items()})
+                for name, (buckets, series) in self._histograms.items()
+            }
+
+        for name, (kind, help_text) in self._meta.items():
+            full = f'{self.prefix}_{name}'
+            lines.append(f'# HELP {full} {help_text}')
+            lines.append(f'# TYPE {full} {kind}')
+            if kind == 'counter':
+                for key, value in sorted(counters[name].items()):
+                    lines.append(f'{full}{self._labels(key)} {value}')
+            elif kind == 'histogram':
+                buckets, series = histograms[name]
+                for key, counts in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(buckets, counts):
+                        cumulative += count
+                        lines.append(f'{full}_bucket{self._labels(key + (("le", bound),))} {cumulative}')
+                    lines.append(f'{full}_bucket{self._labels(key + (("le", "+Inf"),))} {counts[-2]}')
+                    lines.append(f'{full}_sum{self._labels(key)} {round(counts[-1], 6)}')
+                    lines.append(f'{full}_count{self._labels(key)} {counts[-2]}')
+            else:
+                try:
+                    values = self._gauges[name]()
+                except Exception as e:
+                    app.logger.warning(f"No se pudo calcular la métrica {full}: {str(e)}")
+                    continue
+                for key, value in sorted(values.items()):
+                    lines.append(f'{full}{self._labels(key)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics('bloomhub')
+metrics.histogram('upstream_request_seconds', 'Latencia de las llamadas a cada API externa')
+metrics.counter('upstream_requests_total', 'Llamadas a APIs externas por resultado (success, empty, error, rate_limited, breaker_open)')
+metrics.histogram('db_connection_seconds', 'Tiempo en obtener una conexión del pool de MySQL')
+metrics.histogram('bcrypt_seconds', 'Duración de las operaciones bcrypt (hash, check)')
+metrics.counter('search_responses_total', 'Respuestas de /search por código HTTP y modo (json, stream, api)')
+metrics.histogram('search_seconds', 'Duración total de /search')
+metrics.counter('popular_refresh_total', 'Refrescos anticipados de los nombres más buscados por resultado (refreshed, skipped, failed)')
 
 
 DB_CONFIG = {
@@ -36,28 +262,225 @@ DB_CONFIG = {
     "auth_plugin": os.getenv("DB_AUTH_PLUGIN", "mysql_native_password")
 }
 
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_POOL_MAX_OVERFLOW = int(os.getenv('DB_POOL_MAX_OVERFLOW', 5))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', '1') == '1'
+
+
+class PoolTimeout(Exception):
+    """No se liberó ninguna conexión del pool a tiempo"""
+
+
+class PooledConnection:
+    """Conexión prestada por el pool; close() la devuelve en lugar de cerrarla"""
+
+    def __init__(self, pool, conn, created_at):
+        self._pool = pool
+        self._conn = conn
+        self._created_at = created_at
+
+    def close(self):
+        if self._conn is not None:
+            self._pool.release(self._conn, self._created_at)
+            self._conn = None
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones MySQL: mantiene hasta `size` conexiones abiertas y
+    permite `max_overflow` temporales que se cierran al devolverse.
+    """
+
+    def __init__(self, connect, size, max_overflow, timeout, recycle, pre_ping):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self._connect = connect
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size + max_overflow)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._borrows = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._opened = 0
+        self._discarded = 0
+
+    def acquire(self):
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeout(f"Sin conexiones libres tras {self.timeout}s")
+
+        waited = time.monotonic() - start
+        try:
+            conn, created_at = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._borrows += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return PooledConnection(self, conn, created_at)
+
+    def _checkout(self):
+        while True:
+            try:
+                conn, created_at = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+                with self._lock:
+                    self._opened += 1
+                return conn, time.monotonic()
+
+            expired = time.monotonic() - created_at > self.recycle
+            if expired or (self.pre_ping and not self._is_alive(conn)):
+                self._discard(conn)
+                continue
+            return conn, created_at
+
+    def release(self, conn, created_at):
+        try:
+            # Descarta lo que haya quedado sin confirmar antes de reutilizarla
+            conn.rollback()
+            if self._idle.qsize() < self.size:
+                self._idle.put((conn, created_at))
+            else:
+                self._discard(conn)
+        except Exception:
+            self._discard(conn)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def _is_alive(self, conn):
+        try:
+            return conn.is_connected()
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        with self._lock:
+            self._discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'in_use': self._in_use,
+                'idle': self._idle.qsize(),
+                'borrows': self._borrows,
+                'wait_avg_ms': round(self._wait_total / self._borrows * 1000, 3) if self._borrows else 0.0,
+                'wait_max_ms': round(self._wait_max * 1000, 3),
+                'timeouts': self._timeouts,
+                'opened': self._opened,
+                'discarded': self._discarded
+            }
+
+
+db_pool = ConnectionPool(
+    lambda: mysql_connector.connect(**DB_CONFIG),
+    size=DB_POOL_SIZE,
+    max_overflow=DB_POOL_MAX_OVERFLOW,
+    timeout=DB_POOL_TIMEOUT,
+    recycle=DB_POOL_RECYCLE,
+    pre_ping=DB_POOL_PRE_PING
+)
+
+# Pool propio y pequeño para el índice de especies: una búsqueda nunca espera
+# detrás de los logins y, si MySQL tarda, se cae a Perenual en vez de bloquear
+SPECIES_INDEX_TIMEOUT = float(os.getenv('SPECIES_INDEX_TIMEOUT', 0.3))
+species_pool = ConnectionPool(
+    lambda: mysql_connector.connect(**DB_CONFIG, connection_timeout=max(1, int(SPECIES_INDEX_TIMEOUT))),
+    size=int(os.getenv('SPECIES_INDEX_POOL_SIZE', 2)),
+    max_overflow=0,
+    timeout=SPECIES_INDEX_TIMEOUT,
+    recycle=DB_POOL_RECYCLE,
+    pre_ping=DB_POOL_PRE_PING
+)
+
 def get_db_connection():
-    return mysql.connector.connect(**DB_CONFIG)
+    """Toma una conexión del pool; conn.close() la devuelve al pool"""
+    started = time.monotonic()
+    try:
+        return db_pool.acquire()
+    finally:
+        metrics.observe('db_connection_seconds', time.monotonic() - started)
+
+@contextmanager
+def db_cursor(dictionary=False, pool=None):
+    """
+    Presta (conexión, cursor) del pool; ambos se cierran y la conexión vuelve
+    al pool aunque la consulta lance una excepción.
+    """
+    conn = get_db_connection() if pool is None else pool.acquire()
+    try:
+        cur = conn.cursor(dictionary=dictionary)
+        try:
+            yield conn, cur
+        finally:
+            cur.close()
+    finally:
+        conn.close()
 
 def init_db():
     """
-    Crea la tabla de usuarios si no existe.
+    Crea las tablas de usuarios, del índice local de especies y del registro
+    de búsquedas si no existen.
     Puedes ejecutar esto al arrancar el servidor si quieres.
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS usuarios (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            nombre VARCHAR(120) NOT NULL,
-            correo VARCHAR(190) NOT NULL UNIQUE,
-            contrasena VARCHAR(255) NOT NULL,
-            creado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-    """)
-    conn.commit()
-    cur.close()
-    conn.close()
+    with db_cursor() as (conn, cur):
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS usuarios (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                nombre VARCHAR(120) NOT NULL,
+                correo VARCHAR(190) NOT NULL UNIQUE,
+                contrasena VARCHAR(255) NOT NULL,
+                creado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS especies (
+                id INT PRIMARY KEY,
+                common_name VARCHAR(255),
+                scientific_name VARCHAR(255),
+                datos TEXT NOT NULL,
+                actualizado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                FULLTEXT KEY ft_especies_nombres (common_name, scientific_name)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS busquedas (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                consulta VARCHAR(255) NOT NULL,
+                consulta_normalizada VARCHAR(255) NOT NULL,
+                fuentes VARCHAR(255),
+                codigo SMALLINT NOT NULL,
+                modo VARCHAR(16) NOT NULL,
+                latencia_ms INT NOT NULL,
+                creado_en DATETIME(3) NOT NULL,
+                KEY ix_busquedas_creado (creado_en, consulta_normalizada)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+        """)
+        conn.commit()
 
 def login_required(f):
     @wraps(f)
@@ -67,11 +490,50 @@ def login_required(f):
         return f(*args, **kwargs)
     return wrapped
 
-wiki_wiki = wikipediaapi.Wikipedia(
-    language='es',
-    user_agent='BloomHub/3.0',
-    extract_format=wikipediaapi.ExtractFormat.WIKI
-)
+# Conexiones HTTP persistentes (keep-alive) reutilizadas entre búsquedas
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 20))
+
+def build_http_session(headers=None):
+    """Crea una sesión de requests con un pool de conexiones por host"""
+    from requests.adapters import HTTPAdapter
+
+    http = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+    http.mount('https://', adapter)
+    http.mount('http://', adapter)
+    http.headers.update(headers or {})
+    return http
+
+class HTTPSessions:
+    """Sesiones por API creadas en el primer uso (importar requests cuesta ~80 ms)"""
+
+    HEADERS = {
+        'perenual': None,
+        'pixabay': None,
+        'unsplash': None,
+        'wikipedia': {'User-Agent': 'BloomHub/3.0'},
+        'images': {'User-Agent': 'BloomHub/3.0'}
+    }
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, source):
+        http = self._sessions.get(source)
+        if http is None:
+            with self._lock:
+                http = self._sessions.get(source)
+                if http is None:
+                    http = self._sessions[source] = build_http_session(self.HEADERS[source])
+        return http
+
+    def build_all(self):
+        for source in self.HEADERS:
+            self[source]
+
+
+http_sessions = HTTPSessions()
 
 APIS = {
     'perenual': {
@@ -100,9 +562,70 @@ APIS = {
             'content_filter': 'high',
             'per_page': 3
         }
+    },
+    'wikipedia': {
+        'url': 'https://es.wikipedia.org/w/api.php',
+        'params': {
+            'action': 'query',
+            'format': 'json',
+            'formatversion': 2,
+            'prop': 'extracts|info',
+            'inprop': 'url',
+            'redirects': 1,
+            # La resolución de candidatos trae solo la introducción (el resumen);
+            # TextExtracts únicamente devuelve varias páginas con exintro
+            'exintro': 1,
+            'explaintext': 1,
+            # Solo se muestran 500 caracteres de resumen y 1000 de extracto
+            'exchars': 1000,
+            'exlimit': 'max'
+        }
     }
 }
 
+def get_wikipedia_extract(title, timeout):
+    """Extracto del artículo completo (no solo la introducción) de una página ya resuelta"""
+    params = {key: value for key, value in APIS['wikipedia']['params'].items()
+              if key not in ('exintro', 'inprop')}
+    response = http_sessions['wikipedia'].get(
+        APIS['wikipedia']['url'],
+        params={**params, 'titles': title, 'prop': 'extracts', 'exlimit': 1},
+        timeout=timeout
+    )
+    rate_limiters['wikipedia'].observe(response)
+    response.raise_for_status()
+    pages = response.json().get('query', {}).get('pages') or [{}]
+    return pages[0].get('extract')
+
+WIKIPEDIA_MISSING_TTL = int(os.getenv('WIKIPEDIA_MISSING_TTL', 24 * 3600))
+
+# TTL (segundos) de la caché de resultados por fuente. Los datos botánicos y de
+# Wikipedia cambian poco; las URLs de imágenes caducan antes.
+CACHE_TTLS = {
+    'perenual': int(os.getenv('CACHE_TTL_PERENUAL', 24 * 3600)),
+    'wikipedia': int(os.getenv('CACHE_TTL_WIKIPEDIA', 24 * 3600)),
+    'pixabay': int(os.getenv('CACHE_TTL_PIXABAY', 3600)),
+    'unsplash': int(os.getenv('CACHE_TTL_UNSPLASH', 3600))
+}
+CACHE_NEGATIVE_TTL = int(os.getenv('CACHE_NEGATIVE_TTL', 600))
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 1000))
+# Copia en disco de la caché que genera `flask warm-cache` y se carga al arrancar
+CACHE_SNAPSHOT_PATH = os.getenv(
+    'CACHE_SNAPSHOT_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache_snapshot.json')
+)
+WARM_CACHE_RATE = float(os.getenv('WARM_CACHE_RATE', 30))
+
+# Caché compartida entre procesos (varios workers de gunicorn/uwsgi en la misma máquina)
+SHARED_CACHE_ENABLED = os.getenv('SHARED_CACHE_ENABLED', '1') == '1'
+SHARED_CACHE_PATH = os.getenv(
+    'SHARED_CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shared_cache.sqlite3')
+)
+SHARED_CACHE_MAX_ENTRIES = int(os.getenv('SHARED_CACHE_MAX_ENTRIES', 20000))
+SHARED_CACHE_LOCK_SECONDS = float(os.getenv('SHARED_CACHE_LOCK_SECONDS', 30))
+WARM_CACHE_ON_STARTUP = os.getenv('WARM_CACHE_ON_STARTUP', '0') == '1'
+
 FLOWER_KEYWORDS = {
     'rosa', 'rosas', 'rose', 'roses',
     'tulipán', 'tulipanes', 'tulip', 'tulips',
@@ -237,11 +760,26 @@ FLOWER_SYNONYMS = {
     'cala': 'alcatraz'
 }
 
+class _TransliterationTable(dict):
+    """Tabla para str.translate que memoriza unidecode carácter a carácter"""
+
+    def __missing__(self, codepoint):
+        value = unidecode.unidecode(chr(codepoint))
+        self[codepoint] = value
+        return value
+
+
+_TRANSLITERATION = _TransliterationTable()
+
+def transliterate(text):
+    """Equivale a unidecode(text), pero sin recorrer el texto en Python en cada llamada"""
+    return text if text.isascii() else text.translate(_TRANSLITERATION)
+
 def normalize_flower_name(name):
     if not name:
         return None
 
-    normalized = unidecode(name.lower().strip())
+    normalized = transliterate(name.lower().strip())
 
     if normalized.endswith('es'):
         normalized = normalized[:-2]
@@ -250,30 +788,62 @@ def normalize_flower_name(name):
 
     return FLOWER_SYNONYMS.get(normalized, normalized)
 
+FLOWER_PATTERNS = [
+    r'jazm[ií]n', r'jasmine', r'rose', r'rosa',
+    r'orqu[ií]dea', r'orchid', r'tulip', r'tulip[aá]n',
+    r'flor', r'flower', r'blossom', r'bloom',
+    r'girasol', r'sunflower', r'dalia', r'hibisco',
+    r'peon[ií]a', r'azucena', r'alcatraz', r'cala'
+]
+
+def _expand_pattern(pattern):
+    """Expande un patrón con clases simples ('jazm[ií]n') a sus literales"""
+    parts = re.findall(r'\[([^\]]+)\]|([^\[]+)', pattern)
+    options = [list(chars) if chars else [literal] for chars, literal in parts]
+    return [''.join(combination) for combination in itertools.product(*options)]
+
+def _build_trie_regex(words):
+    """
+    Compila las palabras en una única expresión con prefijos comunes factorizados
+    (un trie), de modo que cada posición del texto solo prueba las ramas que
+    empiezan por ese carácter. Como solo interesa si hay alguna coincidencia,
+    las palabras más largas que otra ya incluida se descartan.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        if '' in node:
+            return ''
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items())]
+        return branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+
+    return re.compile(build(trie))
+
+# Se construyen una sola vez: un trie con palabras clave y patrones (cubre
+# "keyword in normalized" y los patrones en una sola pasada) y un bloque con
+# las palabras clave para el caso "normalized in keyword".
+_FLOWER_MATCHER = _build_trie_regex(
+    set(FLOWER_KEYWORDS).union(*(_expand_pattern(pattern) for pattern in FLOWER_PATTERNS))
+)
+_FLOWER_KEYWORD_BLOB = '\n'.join(sorted(FLOWER_KEYWORDS))
+
 def is_flower_related(text):
     if not text:
         return False
 
     normalized = normalize_flower_name(text)
 
-    if any(
-        keyword == normalized or
-        normalized in keyword or
-        keyword in normalized
-        for keyword in FLOWER_KEYWORDS
-    ):
+    # Ninguna palabra clave contiene saltos de línea, así que un texto con
+    # ellos nunca puede ser subcadena de una
+    if '\n' not in normalized and normalized in _FLOWER_KEYWORD_BLOB:
         return True
 
-    
-    patterns = [
-        r'jazm[ií]n', r'jasmine', r'rose', r'rosa',
-        r'orqu[ií]dea', r'orchid', r'tulip', r'tulip[aá]n',
-        r'flor', r'flower', r'blossom', r'bloom',
-        r'girasol', r'sunflower', r'dalia', r'hibisco',
-        r'peon[ií]a', r'azucena', r'alcatraz', r'cala'
-    ]
-
-    return any(re.search(pattern, normalized) for pattern in patterns)
+    return _FLOWER_MATCHER.search(normalized) is not None
 
 def get_scientific_name(common_name):
     
@@ -281,7 +851,377 @@ def get_scientific_name(common_name):
     return SCIENTIFIC_NAMES.get(normalized, common_name)
 
 
-def get_perenual_data(query):
+class UpstreamError(Exception):
+    """Una API externa falló (red, timeout o respuesta inválida)"""
+
+
+class SourceUnavailable(Exception):
+    """El circuit breaker de la fuente está abierto"""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por fuente con timeout adaptativo.
+
+    closed: las peticiones pasan. Tras `failure_threshold` fallos seguidos pasa
+    a open y la fuente se omite sin esperar. Pasados `reset_timeout` segundos
+    pasa a half_open y deja pasar una sola petición de prueba: si funciona se
+    cierra, si falla vuelve a open. El timeout de cada petición sigue al p95 de
+    las latencias recientes, acotado entre min_timeout y max_timeout.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout, min_timeout, max_timeout, multiplier, window=50):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.multiplier = multiplier
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    return False
+                self._trial_in_flight = True
+            return True
+
+    def cancel(self):
+        """Devuelve el turno de prueba de allow() cuando la petición no llegó a salir"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def is_open(self):
+        """True si ahora mismo allow() rechazaría la petición (sin cambiar de estado)"""
+        with self._lock:
+            if self.state == self.OPEN:
+                return time.monotonic() - self._opened_at < self.reset_timeout
+            return self.state == self.HALF_OPEN and self._trial_in_flight
+
+    def record_success(self, latency):
+        with self._lock:
+            self._latencies.append(latency)
+            self._failures = 0
+            self._trial_in_flight = False
+            self.state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def timeout(self):
+        with self._lock:
+            if len(self._latencies) < 5:
+                return self.max_timeout
+            ordered = sorted(self._latencies)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return min(self.max_timeout, max(self.min_timeout, p95 * self.multiplier))
+
+    def snapshot(self):
+        with self._lock:
+            state, failures = self.state, self._failures
+        return {'state': state, 'failures': failures, 'timeout': round(self.timeout(), 3)}
+
+
+class RateLimited(Exception):
+    """La cuota de la fuente está agotada o la API pidió esperar (Retry-After)"""
+
+
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_BACKGROUND = 'background'
+
+
+class RateScheduler:
+    """
+    Token bucket por API externa con cuota por hora y por día (0 = sin límite).
+
+    Las peticiones interactivas (fallos de caché de /search) pueden gastar toda
+    la cuota; las de segundo plano (precarga y refrescos) dejan libre una
+    reserva. El saldo se corrige con las cabeceras de rate limit de cada
+    respuesta según la API (headers) y un 429 bloquea la fuente el tiempo que
+    indique Retry-After.
+
+    Con caché compartida (store() devuelve el SharedResultStore) el saldo vive
+    en su SQLite y lo gastan entre todos los workers, reinicios y comandos de
+    la CLI de la máquina; sin ella, o si el SQLite falla, cada proceso lleva
+    el suyo. Las marcas de tiempo son de reloj (time.time) para que sirvan
+    entre procesos.
+    """
+
+    def __init__(self, source, hourly, daily, background_reserve, headers=None, store=None):
+        self.source = source
+        self.hourly = hourly
+        self.daily = daily
+        self.background_reserve = background_reserve
+        self.headers = headers
+        self.store = store or (lambda: None)
+        self._state = self.initial_state()
+        self._lock = threading.Lock()
+
+    def initial_state(self):
+        return {
+            'hour_tokens': float(self.hourly),
+            'day_tokens': float(self.daily),
+            'blocked_until': 0.0,
+            'updated_at': time.time()
+        }
+
+    def _update(self, fn):
+        """Aplica fn(saldo, ahora) de forma atómica al saldo compartido (o al del proceso)"""
+        def refilled(state, now):
+            return fn(self._refill(state, now), now)
+
+        with self._lock:
+            store = self.store()
+            if store is not None:
+                try:
+                    return store.update_quota(self.source, self.initial_state, refilled)
+                except sqlite3.Error as e:
+                    app.logger.warning(f"Cuota compartida de {self.source} no disponible: {str(e)}")
+            return refilled(self._state, time.time())
+
+    def _refill(self, state, now):
+        elapsed = max(0.0, now - state['updated_at'])
+        state['updated_at'] = now
+        # min(): la cuota configurada pudo bajar desde que se guardó el saldo
+        if self.hourly:
+            state['hour_tokens'] = min(self.hourly, state['hour_tokens'] + elapsed * self.hourly / 3600)
+        if self.daily:
+            state['day_tokens'] = min(self.daily, state['day_tokens'] + elapsed * self.daily / 86400)
+        return state
+
+    def acquire(self, priority=PRIORITY_INTERACTIVE):
+        """Consume un token; False si no hay cuota para esa prioridad"""
+        reserve = self.background_reserve if priority == PRIORITY_BACKGROUND else 0.0
+
+        def take(state, now):
+            if now < state['blocked_until']:
+                return False
+            if self.hourly and state['hour_tokens'] < 1 + reserve * self.hourly:
+                return False
+            if self.daily and state['day_tokens'] < 1 + reserve * self.daily:
+                return False
+            if self.hourly:
+                state['hour_tokens'] -= 1
+            if self.daily:
+                state['day_tokens'] -= 1
+            return True
+
+        return self._update(take)
+
+    def observe(self, response):
+        """Ajusta el saldo con las cabeceras de la respuesta de la API"""
+        headers = response.headers
+        remaining = headers.get('X-RateLimit-Remaining', '')
+        remaining = int(remaining) if remaining.isdigit() else None
+        reset = headers.get('X-RateLimit-Reset', '')
+        reset = int(reset) if reset.isdigit() else None
+        if response.status_code != 429 and (remaining is None or self.headers is None):
+            return
+
+        def apply(state, now):
+            if self.headers == 'hourly' and remaining is not None and self.hourly:
+                # Remaining es lo que queda de la cuota de la hora en curso
+                state['hour_tokens'] = min(state['hour_tokens'], float(remaining))
+            elif self.headers == 'window' and remaining == 0 and reset is not None:
+                # Ventana corta (Pixabay: 60 s) con Reset en segundos; no toca
+                # el saldo por hora, solo bloquea hasta que se renueve
+                state['blocked_until'] = max(state['blocked_until'], now + reset)
+            if response.status_code == 429:
+                state['blocked_until'] = max(state['blocked_until'], now + self._retry_after(headers))
+
+        self._update(apply)
+
+    @staticmethod
+    def _retry_after(headers, default=60):
+        value = headers.get('Retry-After')
+        if not value:
+            return default
+        if value.isdigit():
+            return int(value)
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return default
+
+    def snapshot(self):
+        def read(state, now):
+            return {
+                'hourly_remaining': round(state['hour_tokens'], 1) if self.hourly else None,
+                'daily_remaining': round(state['day_tokens'], 1) if self.daily else None,
+                'blocked_for': round(max(0.0, state['blocked_until'] - now), 1)
+            }
+
+        return self._update(read)
+
+
+# Cuotas por defecto de los planes gratuitos (0 = sin límite)
+RATE_QUOTAS = {
+    'perenual': (int(os.getenv('PERENUAL_QUOTA_HOURLY', 100)), int(os.getenv('PERENUAL_QUOTA_DAILY', 100))),
+    'pixabay': (int(os.getenv('PIXABAY_QUOTA_HOURLY', 5000)), int(os.getenv('PIXABAY_QUOTA_DAILY', 0))),
+    'unsplash': (int(os.getenv('UNSPLASH_QUOTA_HOURLY', 50)), int(os.getenv('UNSPLASH_QUOTA_DAILY', 0))),
+    'wikipedia': (int(os.getenv('WIKIPEDIA_QUOTA_HOURLY', 0)), int(os.getenv('WIKIPEDIA_QUOTA_DAILY', 0)))
+}
+RATE_BACKGROUND_RESERVE = float(os.getenv('RATE_BACKGROUND_RESERVE', 0.2))
+
+# Cómo interpretar X-RateLimit-Remaining/Reset de cada API: 'hourly' si
+# Remaining es lo que queda de la hora (Unsplash, sin Reset), 'window' si es
+# de una ventana corta con Reset en segundos (Pixabay, 60 s). Perenual y
+# Wikipedia no las envían: solo cuentan los 429 y Retry-After.
+RATE_LIMIT_HEADERS = {
+    'pixabay': 'window',
+    'unsplash': 'hourly'
+}
+
+rate_limiters = {
+    source: RateScheduler(
+        source, hourly, daily, RATE_BACKGROUND_RESERVE,
+        headers=RATE_LIMIT_HEADERS.get(source), store=lambda: shared_store
+    )
+    for source, (hourly, daily) in RATE_QUOTAS.items()
+}
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', 5))
+BREAKER_RESET_SECONDS = float(os.getenv('BREAKER_RESET_SECONDS', 30))
+TIMEOUT_MIN_SECONDS = float(os.getenv('TIMEOUT_MIN_SECONDS', 1))
+TIMEOUT_MULTIPLIER = float(os.getenv('TIMEOUT_MULTIPLIER', 3))
+# Timeouts originales de cada fuente, usados como techo del timeout adaptativo
+SOURCE_MAX_TIMEOUTS = {
+    'perenual': 15,
+    'pixabay': 10,
+    'unsplash': 10,
+    'wikipedia': 10
+}
+
+breakers = {
+    source: CircuitBreaker(
+        BREAKER_FAILURE_THRESHOLD,
+        BREAKER_RESET_SECONDS,
+        TIMEOUT_MIN_SECONDS,
+        max_timeout,
+        TIMEOUT_MULTIPLIER
+    )
+    for source, max_timeout in SOURCE_MAX_TIMEOUTS.items()
+}
+
+def perenual_plant_fields(plant):
+    """Campos de una planta de Perenual que usa la app (API e índice local)"""
+    return {
+        'name': plant.get('common_name'),
+        'scientific_name': (plant.get('scientific_name') or [None])[0] if isinstance(plant.get('scientific_name'), list) else plant.get('scientific_name'),
+        'watering': plant.get('watering'),
+        'sunlight': plant.get('sunlight'),
+        'care_level': plant.get('care_level'),
+        'cycle': plant.get('cycle'),
+        'description': plant.get('description', ''),
+        'growth_rate': plant.get('growth_rate'),
+        'hardiness': plant.get('hardiness'),
+        'flowers': plant.get('flowers'),
+        'foliage': plant.get('foliage')
+    }
+
+SPECIES_INDEX_RECHECK_SECONDS = int(os.getenv('SPECIES_INDEX_RECHECK_SECONDS', 300))
+_species_index_state = {'ready': False, 'checked_at': None}
+_species_index_lock = threading.Lock()
+
+def _mark_species_index(ready):
+    with _species_index_lock:
+        _species_index_state['ready'] = ready
+        _species_index_state['checked_at'] = time.monotonic()
+
+def species_index_ready():
+    """
+    El índice solo se consulta cuando la tabla especies tiene filas. La
+    comprobación se cachea SPECIES_INDEX_RECHECK_SECONDS, así que antes de
+    ingest-species (o con MySQL caído) las búsquedas no pagan ni un viaje a la
+    base de datos ni un warning por consulta.
+    """
+    with _species_index_lock:
+        checked_at = _species_index_state['checked_at']
+        if checked_at is not None and time.monotonic() - checked_at < SPECIES_INDEX_RECHECK_SECONDS:
+            return _species_index_state['ready']
+        # Las demás peticiones usan el valor anterior mientras comprobamos
+        _species_index_state['checked_at'] = time.monotonic()
+
+    try:
+        with db_cursor(pool=species_pool) as (conn, cur):
+            cur.execute("SELECT 1 FROM especies LIMIT 1")
+            ready = cur.fetchone() is not None
+    except Exception as e:
+        app.logger.info(f"Índice local de especies no disponible: {str(e)}")
+        ready = False
+    _mark_species_index(ready)
+    return ready
+
+def find_local_species(query):
+    """Busca la planta en el índice local de especies (tabla especies) antes que en Perenual"""
+    if not species_index_ready():
+        return None
+    try:
+        with db_cursor(dictionary=True, pool=species_pool) as (conn, cur):
+            cur.execute(
+                f"SELECT /*+ MAX_EXECUTION_TIME({int(SPECIES_INDEX_TIMEOUT * 1000)}) */ datos FROM especies "
+                "WHERE MATCH(common_name, scientific_name) AGAINST (%s IN NATURAL LANGUAGE MODE) "
+                "LIMIT 10",
+                (query,)
+            )
+            rows = cur.fetchall()
+    except Exception as e:
+        # Se desactiva hasta la próxima comprobación en vez de avisar en cada búsqueda
+        app.logger.warning(f"Índice local de especies no disponible: {str(e)}")
+        _mark_species_index(False)
+        return None
+
+    for row in rows:
+        plant = json.loads(row['datos'])
+        if is_flower_related((plant.get('name') or '').lower()):
+            return plant
+    return None
+
+def store_species(plants):
+    """Inserta o actualiza plantas del species-list de Perenual en la tabla especies"""
+    rows = []
+    for plant in plants:
+        if not plant.get('id') or not plant.get('common_name'):
+            continue
+        fields = perenual_plant_fields(plant)
+        rows.append((
+            plant['id'],
+            fields['name'],
+            fields['scientific_name'],
+            json.dumps(fields, ensure_ascii=False)
+        ))
+    if not rows:
+        return 0
+
+    with db_cursor() as (conn, cur):
+        cur.executemany(
+            "INSERT INTO especies (id, common_name, scientific_name, datos) VALUES (%s, %s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE common_name = VALUES(common_name), "
+            "scientific_name = VALUES(scientific_name), datos = VALUES(datos)",
+            rows
+        )
+        conn.commit()
+    _mark_species_index(True)
+    return len(rows)
+
+def get_perenual_data(query, timeout=15):
 
     try:
         params = {
@@ -290,15 +1230,16 @@ def get_perenual_data(query):
             **APIS['perenual']['params']
         }
 
-        response = requests.get(
+        response = http_sessions['perenual'].get(
             APIS['perenual']['url'],
             params=params,
-            timeout=15
+            timeout=timeout
         )
 
+        rate_limiters['perenual'].observe(response)
         if response.status_code == 429:
             app.logger.warning("Límite de solicitudes excedido en Perenual API")
-            return None
+            raise RateLimited('perenual')
         if response.status_code == 401:
             app.logger.error("Clave API de Perenual no válida")
             return None
@@ -310,25 +1251,15 @@ def get_perenual_data(query):
             for plant in data['data']:
                 common_name = (plant.get('common_name') or '').lower()
                 if is_flower_related(common_name):
-                    return {
-                        'name': plant.get('common_name'),
-                        'scientific_name': (plant.get('scientific_name') or [None])[0] if isinstance(plant.get('scientific_name'), list) else plant.get('scientific_name'),
-                        'watering': plant.get('watering'),
-                        'sunlight': plant.get('sunlight'),
-                        'care_level': plant.get('care_level'),
-                        'cycle': plant.get('cycle'),
-                        'description': plant.get('description', ''),
-                        'growth_rate': plant.get('growth_rate'),
-                        'hardiness': plant.get('hardiness'),
-                        'flowers': plant.get('flowers'),
-                        'foliage': plant.get('foliage')
-                    }
+                    return perenual_plant_fields(plant)
         return None
+    except RateLimited:
+        raise
     except Exception as e:
         app.logger.error(f"Error en Perenual API: {str(e)}")
-        return None
+        raise UpstreamError(str(e)) from e
 
-def get_pixabay_images(query):
+def get_pixabay_images(query, timeout=10):
     """Obtiene imágenes de flores de Pixabay"""
     try:
         params = {
@@ -337,25 +1268,28 @@ def get_pixabay_images(query):
             **APIS['pixabay']['params']
         }
 
-        response = requests.get(
+        response = http_sessions['pixabay'].get(
             APIS['pixabay']['url'],
             params=params,
-            timeout=10
+            timeout=timeout
         )
 
+        rate_limiters['pixabay'].observe(response)
         if response.status_code == 429:
             app.logger.warning("Límite de solicitudes excedido en Pixabay")
-            return []
+            raise RateLimited('pixabay')
 
         response.raise_for_status()
         data = response.json()
 
         return [img.get('webformatURL') for img in data.get('hits', []) if img.get('webformatURL')]
+    except RateLimited:
+        raise
     except Exception as e:
         app.logger.error(f"Error en Pixabay API: {str(e)}")
-        return []
+        raise UpstreamError(str(e)) from e
 
-def get_unsplash_images(query):
+def get_unsplash_images(query, timeout=10):
     """Obtiene imágenes de flores de Unsplash"""
     try:
         headers = {
@@ -367,13 +1301,19 @@ def get_unsplash_images(query):
             **APIS['unsplash']['params']
         }
 
-        response = requests.get(
+        response = http_sessions['unsplash'].get(
             APIS['unsplash']['url'],
             headers=headers,
             params=params,
-            timeout=10
+            timeout=timeout
         )
 
+        rate_limiters['unsplash'].observe(response)
+        if response.status_code == 429 or (
+            response.status_code == 403 and response.headers.get('X-Ratelimit-Remaining') == '0'
+        ):
+            app.logger.warning("Límite de solicitudes excedido en Unsplash")
+            raise RateLimited('unsplash')
         if response.status_code == 403:
             app.logger.error("Clave API de Unsplash no válida o límite excedido")
             return []
@@ -382,92 +1322,1369 @@ def get_unsplash_images(query):
         data = response.json()
 
         return [img['urls']['regular'] for img in data.get('results', []) if img.get('urls', {}).get('regular')]
+    except RateLimited:
+        raise
     except Exception as e:
         app.logger.error(f"Error en Unsplash API: {str(e)}")
-        return []
+        raise UpstreamError(str(e)) from e
+
+def _resolve_wikipedia_titles(data):
+    """Mapa título pedido -> página, siguiendo normalizaciones y redirecciones"""
+    query = data.get('query', {})
+    aliases = {}
+    for step in query.get('normalized', []) + query.get('redirects', []):
+        aliases[step['from']] = step['to']
+    pages = {page['title']: page for page in query.get('pages', [])}
+
+    def resolve(title):
+        seen = set()
+        while title in aliases and title not in seen:
+            seen.add(title)
+            title = aliases[title]
+        return pages.get(title)
 
-def get_wikipedia_data(query):
+    return resolve
+
+def get_wikipedia_data(query, timeout=10):
     """Obtiene información de Wikipedia"""
     try:
-       
-        page = wiki_wiki.page(f"{query} (flor)")
-
-        if not page.exists():
-           
-            page = wiki_wiki.page(query)
-
-            if not page.exists():
-               
-                sci_name = get_scientific_name(query)
-                if sci_name != query:
-                    page = wiki_wiki.page(sci_name)
-                    if not page.exists():
-                        return None
-
-       
-        if not is_flower_related(page.summary or '') and not is_flower_related(page.title or ''):
+        candidates = [f"{query} (flor)", query]
+        sci_name = get_scientific_name(query)
+        if sci_name != query:
+            candidates.append(sci_name)
+
+        # Los títulos que ya sabemos que no existen no se vuelven a pedir
+        candidates = [
+            title for title in candidates
+            if not wiki_missing_titles.get('wikipedia', title, record=False)[0]
+        ]
+        if not candidates:
+            return None
+
+        # Una sola petición resuelve todos los candidatos y trae el extracto
+        response = http_sessions['wikipedia'].get(
+            APIS['wikipedia']['url'],
+            params={'titles': '|'.join(candidates), **APIS['wikipedia']['params']},
+            timeout=timeout
+        )
+        rate_limiters['wikipedia'].observe(response)
+        if response.status_code == 429:
+            app.logger.warning("Límite de solicitudes excedido en Wikipedia")
+            raise RateLimited('wikipedia')
+
+        response.raise_for_status()
+        data = response.json()
+        if 'error' in data:
+            raise ValueError(data['error'].get('info', 'respuesta de error'))
+
+        resolve = _resolve_wikipedia_titles(data)
+        page = None
+        for title in candidates:
+            found = resolve(title)
+            if not found or found.get('missing') or found.get('invalid'):
+                wiki_missing_titles.set('wikipedia', title, False)
+                continue
+            if page is None:
+                page = found
+
+        if page is None:
+            return None
+
+        summary = page.get('extract') or ''
+        title = page.get('title') or ''
+        if not is_flower_related(summary) and not is_flower_related(title):
             return None
 
+        # El extracto es el comienzo del artículo completo, como antes; si esa
+        # segunda petición falla se muestra la introducción
+        try:
+            extract = get_wikipedia_extract(title, timeout) or summary
+        except Exception as e:
+            app.logger.warning(f"Extracto de Wikipedia no disponible para {title}: {str(e)}")
+            extract = summary
+
         return {
-            'title': page.title,
-            'summary': (page.summary[:500] + '...') if page.summary else None,
-            'url': page.fullurl,
-            'extract': page.text[:1000] if page.text else None
+            'title': title,
+            'summary': (summary[:500] + '...') if summary else None,
+            'url': page.get('fullurl'),
+            'extract': extract[:1000] if extract else None
         }
+    except RateLimited:
+        raise
     except Exception as e:
         app.logger.error(f"Error en Wikipedia API: {str(e)}")
-        return None
+        raise UpstreamError(str(e)) from e
 
-def generate_suggestions(query):
-    """Genera sugerencias relevantes basadas en la consulta"""
-    suggestions = set()
+class ResultCache:
+    """Caché en memoria con TTL por fuente, expulsión LRU y caché negativa"""
 
-    for synonym, canonical in FLOWER_SYNONYMS.items():
-        if query in synonym:
-            suggestions.add(canonical)
+    def __init__(self, max_entries, ttls, negative_ttl):
+        self.max_entries = max_entries
+        self.ttls = ttls
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
 
-    for flower in FLOWER_KEYWORDS:
-        if query in flower or flower in query:
-            suggestions.add(flower)
+    def get(self, source, key, record=True):
+        """Devuelve (encontrado, valor); un valor vacío en caché también cuenta como acierto"""
+        with self._lock:
+            entry = self._entries.get((source, key))
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[(source, key)]
+                if record:
+                    self.misses += 1
+                return False, None
+            self._entries.move_to_end((source, key))
+            if record:
+                self.hits += 1
+            return True, entry[1]
 
-    prefix = query[:3] if query else ''
-    for flower in FLOWER_KEYWORDS:
-        if prefix and flower.startswith(prefix):
-            suggestions.add(flower)
+    def set(self, source, key, value):
+        ttl = self.ttls.get(source, self.negative_ttl) if value else self.negative_ttl
+        with self._lock:
+            self._entries[(source, key)] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end((source, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
 
-    if len(suggestions) < 3:
-        suggestions.update(['rosa', 'tulipán', 'girasol', 'orquídea', 'jazmín'])
+    def expires_in(self, source, key):
+        """(segundos de vigencia, tiene datos) de una entrada, o (None, False) si no está"""
+        with self._lock:
+            entry = self._entries.get((source, key))
+        if entry is None:
+            return None, False
+        remaining = entry[0] - time.monotonic()
+        if remaining <= 0:
+            return None, False
+        return remaining, bool(entry[1])
 
-    return sorted(suggestions)[:10]
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
 
-def enhance_plant_data(plant_data, wiki_data, query):
-    """Combina y mejora datos de plantas"""
-    if not plant_data:
-        plant_data = {'name': query.capitalize()}
+    def dump(self, path):
+        """Guarda las entradas vigentes en un JSON (escritura atómica)"""
+        now = time.monotonic()
+        with self._lock:
+            entries = [
+                {'source': source, 'key': key, 'value': value, 'expires_at': time.time() + expires - now}
+                for (source, key), (expires, value) in self._entries.items()
+                if expires > now
+            ]
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'entries': entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return len(entries)
 
-    if wiki_data:
-        if not plant_data.get('scientific_name'):
-            plant_data['scientific_name'] = wiki_data.get('title')
+    def load(self, path):
+        """Carga las entradas no caducadas de un JSON generado con dump()"""
+        with open(path, encoding='utf-8') as f:
+            entries = json.load(f).get('entries', [])
+        now_wall, now = time.time(), time.monotonic()
+        loaded = 0
+        with self._lock:
+            for entry in entries:
+                remaining = entry['expires_at'] - now_wall
+                if remaining <= 0:
+                    continue
+                key = (entry['source'], entry['key'])
+                self._entries[key] = (now + remaining, entry['value'])
+                self._entries.move_to_end(key)
+                loaded += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return loaded
 
-        if wiki_data.get('summary'):
-            if plant_data.get('description'):
-                if wiki_data['summary'] not in plant_data['description']:
-                    plant_data['description'] += "\n\n" + wiki_data['summary']
-            else:
-                plant_data['description'] = wiki_data['summary']
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0
+            }
 
 
-    if not plant_data.get('scientific_name'):
-        plant_data['scientific_name'] = get_scientific_name(query)
+class SharedResultStore:
+    """
+    Resultados de las APIs externas compartidos por todos los procesos de la
+    máquina en un SQLite en modo WAL, con TTL por fuente, caché negativa y
+    expulsión de las entradas menos usadas al superar max_entries.
 
-    return plant_data
+    try_lock() reserva una clave entre procesos (una fila con caducidad en la
+    tabla bloqueos) para que solo un worker consulte la API; los demás esperan
+    el resultado con wait_for().
+    """
 
-@app.before_request
-def load_user():
-    g.user = session.get("usuario")
+    TOUCH_INTERVAL = 60
+    EVICT_EVERY = 100
 
-@app.route("/login", methods=["GET", "POST"])
-def login():
+    def __init__(self, path, ttls, negative_ttl, max_entries, lock_seconds):
+        self.path = path
+        self.ttls = ttls
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.lock_seconds = lock_seconds
+        self.hits = 0
+        self.misses = 0
+        self.waited = 0
+        self._writes = 0
+        self._owner = None
+        self._ready = False
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def setup(self):
+        """Crea el archivo y las tablas si no existen (si no, se hace con la primera conexión)"""
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        try:
+            self._create_tables(conn)
+        finally:
+            conn.close()
+
+    def _create_tables(self, conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS resultados (
+                source TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (source, key)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_resultados_accessed ON resultados (accessed_at)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS bloqueos (
+                source TEXT NOT NULL,
+                key TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (source, key)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cuotas (
+                source TEXT PRIMARY KEY,
+                hour_tokens REAL NOT NULL,
+                day_tokens REAL NOT NULL,
+                blocked_until REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._ready = True
+
+    def update_quota(self, source, initial_state, fn):
+        """
+        Lee el saldo de cuota de source (o initial_state() si no hay), aplica
+        fn(saldo, ahora) y lo guarda en una sola transacción, así dos procesos
+        no pueden gastar el mismo token. Devuelve lo que devuelva fn.
+        """
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT hour_tokens, day_tokens, blocked_until, updated_at FROM cuotas WHERE source = ?",
+                (source,)
+            ).fetchone()
+            state = initial_state() if row is None else dict(zip(
+                ('hour_tokens', 'day_tokens', 'blocked_until', 'updated_at'), row
+            ))
+            result = fn(state, time.time())
+            conn.execute(
+                "INSERT OR REPLACE INTO cuotas (source, hour_tokens, day_tokens, blocked_until, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (source, state['hour_tokens'], state['day_tokens'], state['blocked_until'], state['updated_at'])
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    def _connection(self):
+        # Una conexión por hilo y por proceso (tras un fork se abre otra)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if not self._ready:
+                self._create_tables(conn)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    @property
+    def owner(self):
+        """Identificador del proceso y del hilo que toma los bloqueos"""
+        return f"{os.getpid()}:{threading.get_ident()}"
+
+    def get(self, source, key, record=True, min_ttl=0):
+        """
+        Devuelve (encontrado, valor) si hay una entrada vigente; con min_ttl
+        solo si le quedan al menos esos segundos (refresco anticipado).
+        """
+        now = time.time()
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT value, expires_at, accessed_at FROM resultados WHERE source = ? AND key = ?",
+            (source, key)
+        ).fetchone()
+        if row is None or row[1] <= now + min_ttl:
+            if record:
+                with self._lock:
+                    self.misses += 1
+            return False, None
+        if row[2] < now - self.TOUCH_INTERVAL:
+            # LRU aproximado: no se escribe en cada lectura
+            conn.execute(
+                "UPDATE resultados SET accessed_at = ? WHERE source = ? AND key = ?",
+                (now, source, key)
+            )
+        if record:
+            with self._lock:
+                self.hits += 1
+        return True, json.loads(row[0])
+
+    def set(self, source, key, value):
+        now = time.time()
+        ttl = self.ttls.get(source, self.negative_ttl) if value else self.negative_ttl
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO resultados (source, key, value, expires_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (source, key, json.dumps(value, ensure_ascii=False), now + ttl, now)
+        )
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % self.EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """Borra lo caducado y, si sobran entradas, las de acceso más antiguo"""
+        now = time.time()
+        conn = self._connection()
+        conn.execute("DELETE FROM resultados WHERE expires_at <= ?", (now,))
+        conn.execute("DELETE FROM bloqueos WHERE expires_at <= ?", (now,))
+        excess = conn.execute("SELECT COUNT(*) FROM resultados").fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM resultados WHERE rowid IN "
+                "(SELECT rowid FROM resultados ORDER BY accessed_at LIMIT ?)",
+                (excess,)
+            )
+
+    def try_lock(self, source, key):
+        """True si este hilo reserva la clave; un bloqueo caducado se puede robar"""
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            "INSERT INTO bloqueos (source, key, owner, expires_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (source, key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE bloqueos.expires_at <= ?",
+            (source, key, self.owner, now + self.lock_seconds, now)
+        )
+        row = conn.execute(
+            "SELECT owner FROM bloqueos WHERE source = ? AND key = ?", (source, key)
+        ).fetchone()
+        return row is not None and row[0] == self.owner
+
+    def unlock(self, source, key):
+        self._connection().execute(
+            "DELETE FROM bloqueos WHERE source = ? AND key = ? AND owner = ?",
+            (source, key, self.owner)
+        )
+
+    def wait_for(self, source, key, timeout, interval=0.05):
+        """
+        Espera a que otro proceso guarde la clave. Devuelve (encontrado, valor);
+        (False, None) si el bloqueo se libera sin resultado o se agota el tiempo.
+        """
+        with self._lock:
+            self.waited += 1
+        deadline = time.monotonic() + timeout
+        conn = self._connection()
+        while time.monotonic() < deadline:
+            time.sleep(interval)
+            found, value = self.get(source, key, record=False)
+            if found:
+                return True, value
+            locked = conn.execute(
+                "SELECT 1 FROM bloqueos WHERE source = ? AND key = ? AND expires_at > ?",
+                (source, key, time.time())
+            ).fetchone()
+            if locked is None:
+                break
+        return False, None
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            stats = {
+                'hits': self.hits,
+                'misses': self.misses,
+                'waited_for_peer': self.waited,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0
+            }
+        try:
+            stats['entries'] = self._connection().execute("SELECT COUNT(*) FROM resultados").fetchone()[0]
+        except sqlite3.Error:
+            stats['entries'] = None
+        return stats
+
+
+class SingleFlight:
+    """Agrupa llamadas concurrentes con la misma clave en una sola ejecución"""
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args):
+        """Ejecuta fn una vez por clave; los demás esperan el mismo resultado o error"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+            else:
+                self.coalesced += 1
+
+        if leader:
+            self._run(key, future, fn, *args)
+
+        return future.result()
+
+    def submit(self, key, executor, fn, *args):
+        """
+        Como do() pero sin bloquear: si ya hay un líder para la clave devuelve
+        su Future y el que se une no ocupa ningún hilo del executor; si no,
+        lanza fn en el executor y devuelve el Future al que se unirán los demás.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            future = Future()
+            self._calls[key] = future
+
+        try:
+            executor.submit(self._run, key, future, fn, *args)
+        except BaseException as e:
+            # Los que se unieron mientras tanto reciben el mismo error
+            with self._lock:
+                del self._calls[key]
+            future.set_exception(e)
+            raise
+        return future
+
+    def _run(self, key, future, fn, *args):
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class ExecutorSaturated(Exception):
+    """El pool de trabajo compartido no admite más tareas en cola"""
+
+
+class BoundedExecutor:
+    """ThreadPoolExecutor compartido por todo el proceso con límite de cola"""
+
+    def __init__(self, max_workers, queue_limit, thread_name_prefix):
+        self.max_workers = max_workers
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=thread_name_prefix
+        )
+        self._slots = threading.BoundedSemaphore(max_workers + queue_limit)
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            raise ExecutorSaturated(f"Pool saturado ({self.max_workers} hilos, cola {self.queue_limit})")
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def pending(self):
+        """Tareas en ejecución más tareas esperando en la cola"""
+        return self._pending
+
+
+# Miniaturas de la galería servidas desde la app (/img) en lugar de enlazar
+# las imágenes completas de Pixabay y Unsplash
+IMAGE_PROXY_ENABLED = os.getenv('IMAGE_PROXY_ENABLED', '1') == '1'
+IMAGE_CACHE_DIR = os.getenv(
+    'IMAGE_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'image_cache')
+)
+IMAGE_CACHE_MAX_MB = float(os.getenv('IMAGE_CACHE_MAX_MB', 256))
+# .flower-img mide 200 px de alto y ~320 px de ancho: el doble para pantallas HiDPI
+IMAGE_THUMB_WIDTH = int(os.getenv('IMAGE_THUMB_WIDTH', 640))
+IMAGE_THUMB_HEIGHT = int(os.getenv('IMAGE_THUMB_HEIGHT', 400))
+IMAGE_THUMB_QUALITY = int(os.getenv('IMAGE_THUMB_QUALITY', 80))
+IMAGE_MAX_SOURCE_BYTES = int(os.getenv('IMAGE_MAX_SOURCE_BYTES', 10 * 1024 * 1024))
+IMAGE_FETCH_TIMEOUT = float(os.getenv('IMAGE_FETCH_TIMEOUT', 10))
+IMAGE_DEAD_TTL = int(os.getenv('IMAGE_DEAD_TTL', 24 * 3600))
+IMAGE_PROXY_MAX_AGE = int(os.getenv('IMAGE_PROXY_MAX_AGE', 365 * 24 * 3600))
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 4))
+IMAGE_QUEUE_LIMIT = int(os.getenv('IMAGE_QUEUE_LIMIT', 32))
+# Hosts (y sus subdominios) de los que el proxy acepta descargar: aunque se
+# falsifique una firma no puede pedir URLs internas
+IMAGE_ALLOWED_HOSTS = tuple(
+    host.strip().lower()
+    for host in os.getenv('IMAGE_ALLOWED_HOSTS', 'pixabay.com,images.unsplash.com').split(',')
+    if host.strip()
+)
+
+IMAGE_SOURCES = ('pixabay', 'unsplash')
+
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif')
+)
+
+def sniff_image_type(head):
+    """Tipo MIME según los primeros bytes, o None si no es una imagen conocida"""
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    for magic, mimetype in IMAGE_SIGNATURES:
+        if head.startswith(magic):
+            return mimetype
+    return None
+
+
+class ImageUnavailable(Exception):
+    """No se pudo obtener la imagen; dead indica que la URL está rota (no un fallo pasajero)"""
+
+    def __init__(self, message, dead=False):
+        super().__init__(message)
+        self.dead = dead
+
+
+class ImageProxy:
+    """
+    Caché en disco de las miniaturas de la galería. Cada URL se descarga una
+    sola vez, se recorta y reduce a size (si Pillow está instalado; si no se
+    guarda tal cual) y se guarda con el sha256 de la URL como nombre. Al
+    superar max_bytes se borran las menos usadas (por mtime, que se actualiza
+    al servirlas). Las URLs que responden 403/404/410 o no son imágenes se
+    marcan como rotas durante dead_ttl.
+
+    Las URLs de /img van firmadas con HMAC para que el proxy solo descargue
+    imágenes que ha devuelto la propia app, y solo de allowed_hosts y sin
+    seguir redirecciones.
+    """
+
+    TOUCH_INTERVAL = 60
+    EVICT_EVERY = 50
+    DEAD_STATUS = (401, 403, 404, 410)
+
+    def __init__(self, directory, max_bytes, size, quality, max_source_bytes,
+                 timeout, dead_ttl, secret, executor, allowed_hosts):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = size
+        self.quality = quality
+        self.max_source_bytes = max_source_bytes
+        self.timeout = timeout
+        self.dead_ttl = dead_ttl
+        self.executor = executor
+        self.allowed_hosts = allowed_hosts
+        self.hits = 0
+        self.misses = 0
+        self.dead = 0
+        self._secret = secret.encode('utf-8')
+        self._bytes = None
+        self._writes = 0
+        self._inflight = SingleFlight()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def signature(self, url):
+        return hmac.new(self._secret, url.encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+
+    def allowed(self, url):
+        """True si url es http(s) de uno de allowed_hosts o de un subdominio"""
+        try:
+            parts = urlsplit(url)
+            host = (parts.hostname or '').lower()
+        except ValueError:
+            return False
+        return parts.scheme in ('http', 'https') and any(
+            host == allowed or host.endswith('.' + allowed) for allowed in self.allowed_hosts
+        )
+
+    def _path(self, key, suffix=''):
+        return os.path.join(self.directory, key[:2], key + suffix)
+
+    def is_dead(self, url):
+        try:
+            return os.path.getmtime(self._path(self.key(url), '.dead')) > time.time() - self.dead_ttl
+        except OSError:
+            return False
+
+    def cached(self, url):
+        """Ruta de la miniatura si ya está en disco, marcándola como usada"""
+        path = self._path(self.key(url))
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        if mtime < time.time() - self.TOUCH_INTERVAL:
+            # LRU aproximado: no se escribe en cada lectura
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return path
+
+    def thumbnail(self, url):
+        """Ruta de la miniatura de url, descargándola si hace falta"""
+        path = self.cached(url)
+        if path is not None:
+            with self._lock:
+                self.hits += 1
+            return path
+        if self.is_dead(url):
+            raise ImageUnavailable(f"{url}: marcada como rota", dead=True)
+        with self._lock:
+            self.misses += 1
+        return self._inflight.do(self.key(url), self._fetch, url)
+
+    def _fetch(self, url):
+        key = self.key(url)
+        path = self._path(key)
+        if os.path.exists(path):
+            # Otro proceso la guardó mientras tanto
+            return path
+        if not self.allowed(url):
+            # Sin marca .dead: no se escribe nada en disco por URLs ajenas
+            raise ImageUnavailable(f"{url}: host no permitido", dead=True)
+        try:
+            with http_sessions['images'].get(url, timeout=self.timeout, stream=True,
+                                             allow_redirects=False) as response:
+                if response.status_code in self.DEAD_STATUS:
+                    self._mark_dead(key)
+                    raise ImageUnavailable(f"{url}: HTTP {response.status_code}", dead=True)
+                if response.status_code != 200:
+                    raise ImageUnavailable(f"{url}: HTTP {response.status_code}")
+                data = bytearray()
+                for chunk in response.iter_content(64 * 1024):
+                    data += chunk
+                    if len(data) > self.max_source_bytes:
+                        self._mark_dead(key)
+                        raise ImageUnavailable(f"{url}: más de {self.max_source_bytes} bytes", dead=True)
+        except requests.RequestException as e:
+            raise ImageUnavailable(f"{url}: {str(e)}") from e
+
+        if sniff_image_type(bytes(data[:16])) is None:
+            self._mark_dead(key)
+            raise ImageUnavailable(f"{url}: no es una imagen", dead=True)
+        try:
+            body = self._resize(bytes(data))
+        except Exception as e:
+            # Pillow lanza OSError, ValueError o DecompressionBombError
+            self._mark_dead(key)
+            raise ImageUnavailable(f"{url}: {str(e)}", dead=True) from e
+        self._store(path, body)
+        return path
+
+    def _resize(self, data):
+        """JPEG recortado a size; si ya es más pequeña, la imagen original"""
+        with Image.open(io.BytesIO(data)) as image:
+            if image.width <= self.size[0] and image.height <= self.size[1]:
+                return data
+            image.draft('RGB', self.size)
+            thumb = ImageOps.fit(ImageOps.exif_transpose(image).convert('RGB'), self.size, Image.LANCZOS)
+        out = io.BytesIO()
+        thumb.save(out, 'JPEG', quality=self.quality, optimize=True, progressive=True)
+        return out.getvalue()
+
+    def _store(self, path, body):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._writes += 1
+            if self._bytes is not None:
+                self._bytes += len(body)
+            evict = (
+                self._bytes is None or self._bytes > self.max_bytes or
+                self._writes % self.EVICT_EVERY == 0
+            )
+        if evict:
+            self.evict()
+
+    def _mark_dead(self, key):
+        with self._lock:
+            self.dead += 1
+        path = self._path(key, '.dead')
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w'):
+                pass
+        except OSError:
+            pass
+
+    def evict(self):
+        """Borra las marcas caducadas y, si se supera max_bytes, las miniaturas menos usadas hasta el 90 %"""
+        now = time.time()
+        entries = []
+        total = 0
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                expired_marker = entry.name.endswith('.dead') and stat.st_mtime < now - self.dead_ttl
+                stale_tmp = entry.name.endswith('.tmp') and stat.st_mtime < now - 3600
+                if expired_marker or stale_tmp:
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+                elif not entry.name.endswith(('.dead', '.tmp')):
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+
+        if total > self.max_bytes:
+            entries.sort()
+            target = self.max_bytes * 0.9
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+        with self._lock:
+            self._bytes = total
+
+    def live(self, urls):
+        """urls sin las que ya se sabe que están rotas (no descarga nada)"""
+        return [url for url in urls if not self.is_dead(url)]
+
+    def prefetch(self, urls, on_dead):
+        """
+        Descarga en segundo plano las miniaturas que faltan, sin esperarlas.
+        Cuando terminan todas llama a on_dead con el conjunto de URLs rotas
+        (si hay alguna).
+        """
+        futures = []
+        for url in urls:
+            if not self.allowed(url) or self.cached(url) is not None or self.is_dead(url):
+                continue
+            try:
+                futures.append(self.executor.submit(self.thumbnail, url))
+            except ExecutorSaturated:
+                break
+        if not futures:
+            return
+
+        lock = threading.Lock()
+        pending = [len(futures)]
+
+        def done(_):
+            with lock:
+                pending[0] -= 1
+                if pending[0]:
+                    return
+            dead = {url for url in urls if self.is_dead(url)}
+            if dead:
+                on_dead(dead)
+
+        for future in futures:
+            future.add_done_callback(done)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'dead': self.dead,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0
+            }
+
+
+# Presupuesto de latencia por búsqueda: al agotarse se responde con las
+# fuentes que ya terminaron y las demás se marcan como 'timeout'.
+SEARCH_BUDGET_SECONDS = float(os.getenv('SEARCH_BUDGET_SECONDS', 1.5))
+# 'serial' solo busca el nombre científico cuando el común no devolvió nada;
+# 'speculative' lanza a la vez el científico con prioridad de segundo plano
+# (no gasta la reserva de cuota de las búsquedas interactivas).
+SEARCH_FALLBACK_MODE = os.getenv('SEARCH_FALLBACK_MODE', 'serial')
+SEARCH_WORKERS = int(os.getenv('SEARCH_WORKERS', 16))
+SEARCH_QUEUE_LIMIT = int(os.getenv('SEARCH_QUEUE_LIMIT', 64))
+
+# Pool dedicado a bcrypt para que una ráfaga de logins no acapare los workers web
+HASH_WORKERS = int(os.getenv('HASH_WORKERS', 4))
+HASH_QUEUE_LIMIT = int(os.getenv('HASH_QUEUE_LIMIT', 16))
+
+# Pool compartido por las búsquedas por lotes (/search/batch). Cada lote tiene
+# como mucho BATCH_CONCURRENCY nombres en curso para no llenar la cola de search.
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', 4))
+BATCH_QUEUE_LIMIT = int(os.getenv('BATCH_QUEUE_LIMIT', 16))
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', 4))
+BATCH_MAX_QUERIES = int(os.getenv('BATCH_MAX_QUERIES', 1000))
+BATCH_BUDGET_SECONDS = float(os.getenv('BATCH_BUDGET_SECONDS', 10))
+
+result_cache = ResultCache(CACHE_MAX_ENTRIES, CACHE_TTLS, CACHE_NEGATIVE_TTL)
+wiki_missing_titles = ResultCache(5000, {}, WIKIPEDIA_MISSING_TTL)
+# El SQLite y la carpeta de miniaturas se crean en create_app() (o con el
+# primer uso), no al importar el módulo
+shared_store = SharedResultStore(
+    SHARED_CACHE_PATH, CACHE_TTLS, CACHE_NEGATIVE_TTL,
+    SHARED_CACHE_MAX_ENTRIES, SHARED_CACHE_LOCK_SECONDS
+) if SHARED_CACHE_ENABLED else None
+inflight = SingleFlight()
+search_executor = BoundedExecutor(SEARCH_WORKERS, SEARCH_QUEUE_LIMIT, 'search')
+hash_executor = BoundedExecutor(HASH_WORKERS, HASH_QUEUE_LIMIT, 'bcrypt')
+batch_executor = BoundedExecutor(BATCH_WORKERS, BATCH_QUEUE_LIMIT, 'batch')
+image_executor = BoundedExecutor(IMAGE_WORKERS, IMAGE_QUEUE_LIMIT, 'image')
+def build_image_proxy():
+    """
+    ImageProxy, o None si está desactivado. No se activa con la SECRET_KEY por
+    defecto (cualquiera podría firmar URLs) ni sin Pillow (serviría las
+    imágenes completas en lugar de miniaturas).
+    """
+    if not IMAGE_PROXY_ENABLED:
+        return None
+    if app.secret_key == DEFAULT_SECRET_KEY:
+        app.logger.warning("Proxy de miniaturas desactivado: define SECRET_KEY")
+        return None
+    if Image is None:
+        app.logger.warning("Proxy de miniaturas desactivado: instala Pillow (pip install Pillow)")
+        return None
+    return ImageProxy(
+        IMAGE_CACHE_DIR, int(IMAGE_CACHE_MAX_MB * 1024 * 1024),
+        (IMAGE_THUMB_WIDTH, IMAGE_THUMB_HEIGHT), IMAGE_THUMB_QUALITY, IMAGE_MAX_SOURCE_BYTES,
+        IMAGE_FETCH_TIMEOUT, IMAGE_DEAD_TTL, app.secret_key, image_executor, IMAGE_ALLOWED_HOSTS
+    )
+
+image_proxy = build_image_proxy()
+
+def prepare_storage():
+    """
+    Crea el SQLite de la caché compartida y la carpeta de miniaturas. Si
+    alguno no está disponible se sigue sin él, como si estuviera desactivado.
+    """
+    global shared_store, image_proxy
+    if shared_store is not None:
+        try:
+            shared_store.setup()
+        except sqlite3.Error as e:
+            app.logger.warning(f"Caché compartida no disponible en {SHARED_CACHE_PATH}: {str(e)}")
+            shared_store = None
+    if image_proxy is not None:
+        try:
+            os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+        except OSError as e:
+            app.logger.warning(f"Caché de imágenes no disponible en {IMAGE_CACHE_DIR}: {str(e)}")
+            image_proxy = None
+
+SOURCE_FETCHERS = {
+    'perenual': get_perenual_data,
+    'pixabay': get_pixabay_images,
+    'unsplash': get_unsplash_images,
+    'wikipedia': get_wikipedia_data
+}
+
+# Índices locales que se consultan antes de salir a la red
+SOURCE_LOCAL_LOOKUPS = {
+    'perenual': find_local_species
+} if os.getenv('SPECIES_INDEX_ENABLED', '1') == '1' else {}
+
+EMPTY_RESULTS = {
+    'perenual': None,
+    'pixabay': [],
+    'unsplash': [],
+    'wikipedia': None
+}
+
+def _record_upstream(source, started, outcome):
+    metrics.observe('upstream_request_seconds', time.monotonic() - started, source=source)
+    metrics.inc('upstream_requests_total', source=source, outcome=outcome)
+
+def _call_upstream(source, query, priority):
+    breaker = breakers[source]
+    # Primero el breaker: con el circuito abierto no se gasta cuota
+    if not breaker.allow():
+        metrics.inc('upstream_requests_total', source=source, outcome='breaker_open')
+        raise SourceUnavailable(source)
+    if not rate_limiters[source].acquire(priority):
+        breaker.cancel()
+        metrics.inc('upstream_requests_total', source=source, outcome='rate_limited')
+        raise RateLimited(source)
+
+    started = time.monotonic()
+    try:
+        value = SOURCE_FETCHERS[source](query, timeout=breaker.timeout())
+    except UpstreamError:
+        # Los fallos no se guardan en caché: de eso se encarga el breaker
+        breaker.record_failure()
+        _record_upstream(source, started, 'error')
+        raise
+    except RateLimited:
+        # Un 429 no indica que la API esté caída
+        breaker.record_success(time.monotonic() - started)
+        _record_upstream(source, started, 'rate_limited')
+        raise
+    breaker.record_success(time.monotonic() - started)
+    _record_upstream(source, started, 'success' if value else 'empty')
+    if source in IMAGE_SOURCES and image_proxy is not None and value:
+        # Las miniaturas se descargan sin retrasar la búsqueda; las URLs que
+        # resulten rotas se quitan después de la caché
+        image_proxy.prefetch(value, lambda dead: prune_dead_images(source, query, dead))
+        value = image_proxy.live(value)
+    return value
+
+def prune_dead_images(source, query, dead):
+    """Quita de la caché local y compartida las imágenes que el proxy marcó como rotas"""
+    try:
+        found, value = result_cache.get(source, query, record=False)
+        if found and value:
+            result_cache.set(source, query, [url for url in value if url not in dead])
+        if shared_store is not None:
+            found, value = shared_store.get(source, query, record=False)
+            if found and value:
+                shared_store.set(source, query, [url for url in value if url not in dead])
+    except Exception as e:
+        app.logger.warning(f"No se pudieron quitar las imágenes rotas de la caché: {str(e)}")
+
+def live_images(urls):
+    """Imágenes sin las que el proxy ya sabe que están rotas"""
+    if image_proxy is None:
+        return urls
+    return image_proxy.live(urls)
+
+def _load_shared(source, query, priority):
+    """
+    Consulta la API con el bloqueo de la caché compartida: si otro proceso ya
+    la está consultando se espera su resultado en lugar de repetir la llamada.
+    Un fallo del SQLite nunca impide la búsqueda.
+    """
+    locked = False
+    try:
+        locked = shared_store.try_lock(source, query)
+        if not locked:
+            found, value = shared_store.wait_for(source, query, breakers[source].timeout())
+            if found:
+                return value
+    except sqlite3.Error as e:
+        app.logger.warning(f"Caché compartida no disponible: {str(e)}")
+
+    try:
+        value = _call_upstream(source, query, priority)
+        try:
+            shared_store.set(source, query, value)
+        except sqlite3.Error as e:
+            app.logger.warning(f"No se pudo guardar en la caché compartida: {str(e)}")
+        return value
+    finally:
+        if locked:
+            try:
+                shared_store.unlock(source, query)
+            except sqlite3.Error:
+                pass
+
+def _load_source(source, query, priority):
+    # Otro hilo pudo haber llenado la caché justo antes de tomar el turno
+    found, value = result_cache.get(source, query, record=False)
+    if found:
+        return value
+
+    if shared_store is not None:
+        try:
+            found, value = shared_store.get(source, query)
+        except sqlite3.Error as e:
+            app.logger.warning(f"Caché compartida no disponible: {str(e)}")
+            found = False
+        if found:
+            result_cache.set(source, query, value)
+            return value
+
+    local_lookup = SOURCE_LOCAL_LOOKUPS.get(source)
+    if local_lookup:
+        value = local_lookup(query)
+        if value:
+            result_cache.set(source, query, value)
+            return value
+
+    if shared_store is not None:
+        value = _load_shared(source, query, priority)
+    else:
+        value = _call_upstream(source, query, priority)
+
+    result_cache.set(source, query, value)
+    return value
+
+def _cached_only(source, query):
+    """(encontrado, valor) de la caché local o compartida, sin salir a la red"""
+    found, value = result_cache.get(source, query)
+    if found or shared_store is None:
+        return found, value
+    try:
+        found, value = shared_store.get(source, query)
+    except sqlite3.Error:
+        return False, None
+    if found:
+        result_cache.set(source, query, value)
+    return found, value
+
+def start_sources(query, priority=PRIORITY_INTERACTIVE, cache_only=False):
+    """
+    Lanza en el pool las fuentes que no están en caché sin esperar a que terminen.
+    Devuelve (resultados_en_cache, futuros_pendientes, incompletas); las fuentes
+    con el breaker abierto se omiten y quedan como 'unavailable'. Con
+    cache_only no se lanza nada: las que no están en caché quedan como 'uncached'.
+    """
+    results = {}
+    futures = {}
+    incomplete = {}
+    for source in SOURCE_FETCHERS:
+        if cache_only:
+            found, value = _cached_only(source, query)
+        else:
+            found, value = result_cache.get(source, query)
+        if found:
+            results[source] = value
+        elif cache_only:
+            results[source] = EMPTY_RESULTS[source]
+            incomplete[source] = 'uncached'
+        elif breakers[source].is_open():
+            results[source] = EMPTY_RESULTS[source]
+            incomplete[source] = 'unavailable'
+        else:
+            # La prioridad va en la clave: una búsqueda interactiva no hereda el
+            # RateLimited de una consulta de segundo plano (que respeta la
+            # reserva). Con caché compartida la segunda espera igualmente el
+            # resultado de la primera mediante su bloqueo.
+            futures[source] = inflight.submit(
+                (source, query, priority), search_executor, _load_source, source, query, priority
+            )
+    return results, futures, incomplete
+
+def iter_sources(results, futures, incomplete, deadline):
+    """
+    Genera (fuente, valor, estado) en cuanto cada fuente termina: primero las
+    que ya estaban en caché u omitidas y después los futuros por orden de
+    llegada. Estado es True/False, o 'timeout'/'unavailable'/'rate_limited'.
+    Las fuentes que no terminan antes de deadline siguen en segundo plano y
+    guardan su resultado en caché cuando llega.
+    """
+    for source, value in results.items():
+        yield source, value, incomplete.get(source) or bool(value)
+
+    pending = {future: source for source, future in futures.items()}
+    try:
+        for future in as_completed(list(pending), timeout=max(0.0, deadline - time.monotonic())):
+            source = pending.pop(future)
+            value, status = EMPTY_RESULTS[source], False
+            try:
+                value = future.result()
+                status = bool(value)
+            except SourceUnavailable:
+                status = 'unavailable'
+            except RateLimited:
+                status = 'rate_limited'
+            except ExecutorSaturated:
+                # El líder al que se unió esta búsqueda no consiguió hilo
+                status = 'unavailable'
+            except UpstreamError:
+                pass
+            yield source, value, status
+    except FuturesTimeout:
+        pass
+
+    for source in pending.values():
+        yield source, EMPTY_RESULTS[source], 'timeout'
+
+def collect_sources(results, futures, incomplete, deadline):
+    """Espera los futuros hasta deadline. Devuelve (resultados, incompletas)"""
+    collected = {}
+    collected_incomplete = {}
+    for source, value, status in iter_sources(results, futures, incomplete, deadline):
+        collected[source] = value
+        if isinstance(status, str):
+            collected_incomplete[source] = status
+    return collected, collected_incomplete
+
+def fetch_all_sources(query, deadline, priority=PRIORITY_INTERACTIVE):
+    """Consulta las cuatro fuentes; solo las que no están en caché salen a la red"""
+    return collect_sources(*start_sources(query, priority), deadline)
+
+def source_statuses(results, incomplete):
+    """Mapa de fuentes para la respuesta: True/False, o 'timeout'/'unavailable'/'rate_limited'"""
+    return {
+        source: incomplete.get(source) or bool(results[source])
+        for source in SOURCE_FETCHERS
+    }
+
+def _timed_bcrypt(operation, fn, *args):
+    started = time.monotonic()
+    try:
+        return fn(*args)
+    finally:
+        metrics.observe('bcrypt_seconds', time.monotonic() - started, operation=operation)
+
+def hash_password(password, rounds=None):
+    """Genera el hash bcrypt en el pool dedicado"""
+    return hash_executor.submit(
+        _timed_bcrypt, 'hash', get_bcrypt().generate_password_hash, password, rounds
+    ).result().decode("utf-8")
+
+def check_password(stored_hash, password):
+    """Verifica la contraseña en el pool dedicado"""
+    return hash_executor.submit(
+        _timed_bcrypt, 'check', get_bcrypt().check_password_hash, stored_hash, password
+    ).result()
+
+def needs_rehash(stored_hash):
+    """True si el hash se generó con un coste distinto al configurado ($2b$<coste>$...)"""
+    try:
+        return int(stored_hash.split("$")[2]) != app.config["BCRYPT_LOG_ROUNDS"]
+    except (IndexError, ValueError):
+        return False
+
+def _rehash_password(user_id, password):
+    new_hash = _timed_bcrypt('rehash', get_bcrypt().generate_password_hash, password).decode("utf-8")
+    with db_cursor() as (conn, cur):
+        cur.execute("UPDATE usuarios SET contrasena = %s WHERE id = %s", (new_hash, user_id))
+        conn.commit()
+
+def schedule_rehash(user_id, password):
+    """Recalcula el hash en segundo plano; si el pool está lleno se intenta en el próximo login"""
+    try:
+        future = hash_executor.submit(_rehash_password, user_id, password)
+    except ExecutorSaturated:
+        return
+
+    def log_failure(f):
+        if f.exception():
+            app.logger.error(f"Error al recalcular hash: {str(f.exception())}")
+
+    future.add_done_callback(log_failure)
+
+def _edit_distance(a, b, limit):
+    """Distancia de Levenshtein; devuelve limit + 1 en cuanto se supera el límite"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class SuggestionIndex:
+    """
+    Índice de sugerencias que se construye una vez al arrancar: prefijos sobre
+    una lista ordenada (bisect) y trigramas para encontrar candidatos con
+    errores de escritura, que después se ordenan por distancia de edición.
+    """
+
+    def __init__(self, names):
+        # names: clave normalizada -> nombre que se muestra al usuario
+        self._names = names
+        self._keys = sorted(names)
+        self._trigrams = {}
+        for key in self._keys:
+            for gram in self._grams(key):
+                self._trigrams.setdefault(gram, set()).add(key)
+
+    @staticmethod
+    def _grams(text):
+        padded = f"  {text} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def suggest(self, query, limit=10):
+        key = transliterate((query or '').lower().strip())
+        if not key:
+            return []
+
+        scores = {}
+
+        def add(candidate, score):
+            name = self._names[candidate]
+            scores[name] = max(scores.get(name, 0), score)
+
+        start = bisect_left(self._keys, key)
+        for candidate in self._keys[start:]:
+            if not candidate.startswith(key):
+                break
+            # Las terminaciones más cortas (más cercanas a lo escrito) primero
+            add(candidate, 100 if candidate == key else 90 - (len(candidate) - len(key)) * 0.5)
+
+        if len(key) >= 3:
+            grams = self._grams(key)
+            shared = Counter()
+            for gram in grams:
+                for candidate in self._trigrams.get(gram, ()):
+                    shared[candidate] += 1
+
+            max_distance = 1 if len(key) <= 5 else 2
+            # Cada edición destruye como mucho tres trigramas
+            min_shared = max(1, len(grams) - 3 * max_distance)
+            for candidate, count in shared.items():
+                if key in candidate or candidate in key:
+                    add(candidate, 70)
+                if count < min_shared:
+                    continue
+                distance = _edit_distance(key, candidate, max_distance)
+                if distance <= max_distance:
+                    add(candidate, 60 - 10 * distance)
+                elif len(key) >= 4:
+                    distance = _edit_distance(key, candidate[:len(key)], max_distance)
+                    if distance <= max_distance:
+                        add(candidate, 50 - 10 * distance)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [name for name, _ in ranked[:limit]]
+
+
+def _suggestion_names():
+    names = {transliterate(flower.lower()): flower for flower in FLOWER_KEYWORDS}
+    for canonical in FLOWER_SYNONYMS.values():
+        names.setdefault(transliterate(canonical.lower()), canonical)
+    # Los plurales y variantes sin tilde se sugieren con su nombre canónico
+    for synonym, canonical in FLOWER_SYNONYMS.items():
+        names[transliterate(synonym.lower())] = canonical
+    return names
+
+
+@lru_cache(maxsize=None)
+def get_suggestion_index():
+    """Índice de sugerencias, creado con la primera búsqueda (o en prewarm)"""
+    return SuggestionIndex(_suggestion_names())
+
+DEFAULT_SUGGESTIONS = ['rosa', 'tulipán', 'girasol', 'orquídea', 'jazmín']
+
+@lru_cache(maxsize=4096)
+def suggest_flowers(query, limit=10):
+    """Sugerencias ordenadas por relevancia; memorizadas porque se piden en cada tecla"""
+    return tuple(get_suggestion_index().suggest(query, limit))
+
+def generate_suggestions(query):
+    """Genera sugerencias relevantes basadas en la consulta"""
+    suggestions = list(suggest_flowers(query or '', 10))
+
+    if len(suggestions) < 3:
+        suggestions += [flower for flower in DEFAULT_SUGGESTIONS if flower not in suggestions]
+
+    return suggestions[:10]
+
+def enhance_plant_data(plant_data, wiki_data, query):
+    """Combina y mejora datos de plantas"""
+    if not plant_data:
+        plant_data = {'name': query.capitalize()}
+    else:
+        # Copia para no modificar el diccionario guardado en la caché
+        plant_data = dict(plant_data)
+
+    if wiki_data:
+        if not plant_data.get('scientific_name'):
+            plant_data['scientific_name'] = wiki_data.get('title')
+
+        if wiki_data.get('summary'):
+            if plant_data.get('description'):
+                if wiki_data['summary'] not in plant_data['description']:
+                    plant_data['description'] += "\n\n" + wiki_data['summary']
+            else:
+                plant_data['description'] = wiki_data['summary']
+
+
+    if not plant_data.get('scientific_name'):
+        plant_data['scientific_name'] = get_scientific_name(query)
+
+    return plant_data
+
+@app.errorhandler(PoolTimeout)
+@app.errorhandler(ExecutorSaturated)
+def service_busy(e):
+    app.logger.warning(f"Solicitud rechazada por saturación: {str(e)}")
+    return "El servicio está ocupado, intenta de nuevo en unos segundos", 503, {"Retry-After": "2"}
+
+# Endpoints públicos que no guardan la sesión, para que Flask no añada Vary:
+# Cookie y nginx/CDN puedan compartir la misma copia entre usuarios
+SESSIONLESS_ENDPOINTS = set()
+
+
+class PublicSessionInterface(SecureCookieSessionInterface):
+    """
+    No guarda la sesión en los endpoints públicos: con sesión permanente y
+    SESSION_REFRESH_EACH_REQUEST Flask reenviaría Set-Cookie y Vary: Cookie en
+    cada respuesta y nginx/CDN no podrían cachearlas.
+    """
+
+    def save_session(self, app, session, response):
+        if request.endpoint in SESSIONLESS_ENDPOINTS:
+            return
+        super().save_session(app, session, response)
+
+
+app.session_interface = PublicSessionInterface()
+
+@app.before_request
+def load_user():
+    if request.endpoint in SESSIONLESS_ENDPOINTS:
+        return
+    g.user = session.get("usuario")
+
+@app.route("/login", methods=["GET", "POST"])
+def login():
     if request.method == "POST":
         correo = request.form.get("correo", "").strip().lower()
         contrasena = request.form.get("contrasena", "")
@@ -476,14 +2693,13 @@ def login():
             flash("Completa correo y contraseña", "error")
             return redirect(url_for("login"))
 
-        conn = get_db_connection()
-        cur = conn.cursor(dictionary=True)
-        cur.execute("SELECT * FROM usuarios WHERE correo = %s", (correo,))
-        user = cur.fetchone()
-        cur.close()
-        conn.close()
+        with db_cursor(dictionary=True) as (conn, cur):
+            cur.execute("SELECT * FROM usuarios WHERE correo = %s", (correo,))
+            user = cur.fetchone()
 
-        if user and bcrypt.check_password_hash(user["contrasena"], contrasena):
+        if user and check_password(user["contrasena"], contrasena):
+            if needs_rehash(user["contrasena"]):
+                schedule_rehash(user["id"], contrasena)
             session.permanent = True
             session["usuario"] = user["nombre"]
             session["correo"] = user["correo"]
@@ -504,25 +2720,21 @@ def register():
             flash("Todos los campos son obligatorios", "error")
             return redirect(url_for("register"))
 
-        contrasena = bcrypt.generate_password_hash(contrasena_raw).decode("utf-8")
+        contrasena = hash_password(contrasena_raw)
 
-        conn = get_db_connection()
-        cur = conn.cursor()
         try:
-            cur.execute(
-                "INSERT INTO usuarios (nombre, correo, contrasena) VALUES (%s, %s, %s)",
-                (nombre, correo, contrasena)
-            )
-            conn.commit()
+            with db_cursor() as (conn, cur):
+                cur.execute(
+                    "INSERT INTO usuarios (nombre, correo, contrasena) VALUES (%s, %s, %s)",
+                    (nombre, correo, contrasena)
+                )
+                conn.commit()
             flash("Usuario creado correctamente. Ahora inicia sesión", "success")
             return redirect(url_for("login"))
-        except mysql.connector.Error as e:
+        except mysql_connector.Error as e:
             app.logger.error(f"MySQL error: {str(e)}")
             flash("Ese correo ya está registrado", "error")
             return redirect(url_for("register"))
-        finally:
-            cur.close()
-            conn.close()
 
     return render_template("register.html")
 
@@ -538,36 +2750,77 @@ def index():
     return render_template("index.html", usuario=session.get("usuario"))
 
 
-@app.route("/search", methods=["POST"])
+@app.route("/suggest")
 @login_required
-def search():
-    query = request.form.get('query', '').strip()
+def suggest():
+    query = request.args.get('q', '')[:50]
+    limit = max(1, min(request.args.get('limit', 8, type=int), 20))
+    return jsonify({'query': query, 'suggestions': list(suggest_flowers(query, limit))})
 
+
+UNCACHED_RESULT = {
+    'error': 'Esta flor todavía no está en caché; inicia sesión para buscarla',
+    'suggestions': []
+}
+
+def iter_search(query, priority=PRIORITY_INTERACTIVE, budget=None, cache_only=False):
+    """
+    Ejecuta la búsqueda y genera eventos: ('source', fuente, valor, estado) a
+    medida que responde cada fuente del nombre común y, al final,
+    ('result', payload, código HTTP, cabeceras) con la respuesta combinada.
+    budget sustituye a SEARCH_BUDGET_SECONDS (las búsquedas por lotes esperan más).
+    Con cache_only no se llama a ninguna API: si falta alguna fuente en caché
+    el resultado es 202 (UNCACHED_RESULT).
+    """
     if not query or len(query) < 2:
-        return jsonify({'error': 'Ingresa al menos 2 caracteres', 'suggestions': []}), 400
+        yield 'result', {'error': 'Ingresa al menos 2 caracteres', 'suggestions': []}, 400, {}
+        return
 
     normalized_query = normalize_flower_name(query)
 
     if not is_flower_related(normalized_query):
         suggestions = generate_suggestions(normalized_query)
-        return jsonify({
+        yield 'result', {
             'error': f'No encontramos "{query}"',
             'suggestions': suggestions
-        }), 400
+        }, 400, {}
+        return
 
     try:
-        with ThreadPoolExecutor() as executor:
-            perenual_future = executor.submit(get_perenual_data, normalized_query)
-            pixabay_future = executor.submit(get_pixabay_images, normalized_query)
-            unsplash_future = executor.submit(get_unsplash_images, normalized_query)
-            wikipedia_future = executor.submit(get_wikipedia_data, normalized_query)
+        deadline = time.monotonic() + (budget or SEARCH_BUDGET_SECONDS)
+        sci_name = get_scientific_name(normalized_query)
+        normalized_sci = normalize_flower_name(sci_name)
+        has_fallback = bool(normalized_sci) and normalized_sci != normalized_query
+
+        primary = start_sources(normalized_query, priority, cache_only)
+        fallback = None
+        if has_fallback and SEARCH_FALLBACK_MODE == 'speculative':
+            # El nombre científico se conoce de antemano: se lanza en paralelo
+            # en segundo plano y solo se usa si el nombre común no devuelve
+            # nada (si no, su resultado queda en caché). Con el pool lleno no
+            # se lanza y se busca después como en 'serial'.
+            try:
+                fallback = start_sources(normalized_sci, PRIORITY_BACKGROUND, cache_only)
+            except ExecutorSaturated:
+                fallback = None
+
+        results, incomplete = {}, {}
+        for source, value, status in iter_sources(*primary, deadline):
+            results[source] = value
+            if isinstance(status, str):
+                incomplete[source] = status
+            yield 'source', source, value, status
 
-            perenual_data = perenual_future.result()
-            pixabay_data = pixabay_future.result()
-            unsplash_data = unsplash_future.result()
-            wikipedia_data = wikipedia_future.result()
+        if 'uncached' in incomplete.values():
+            yield 'result', UNCACHED_RESULT, 202, {}
+            return
 
-        images = (pixabay_data + unsplash_data) if (pixabay_data or unsplash_data) else []
+        perenual_data = results['perenual']
+        pixabay_data = results['pixabay']
+        unsplash_data = results['unsplash']
+        wikipedia_data = results['wikipedia']
+
+        images = live_images(pixabay_data + unsplash_data) if (pixabay_data or unsplash_data) else []
 
         combined_data = {
             'plant_info': enhance_plant_data(perenual_data, wikipedia_data, query),
@@ -575,31 +2828,32 @@ def search():
             'wikipedia': wikipedia_data,
             'query': query,
             'normalized_query': normalized_query,
-            'sources': {
-                'perenual': bool(perenual_data),
-                'pixabay': bool(pixabay_data),
-                'unsplash': bool(unsplash_data),
-                'wikipedia': bool(wikipedia_data)
-            }
+            'sources': source_statuses(results, incomplete)
         }
 
         
         if not any([perenual_data, pixabay_data, unsplash_data, wikipedia_data]):
-            sci_name = get_scientific_name(normalized_query)
-            if sci_name and sci_name != normalized_query:
-                normalized_sci = normalize_flower_name(sci_name)
-                with ThreadPoolExecutor() as executor:
-                    perenual_future = executor.submit(get_perenual_data, normalized_sci)
-                    pixabay_future = executor.submit(get_pixabay_images, normalized_sci)
-                    unsplash_future = executor.submit(get_unsplash_images, normalized_sci)
-                    wikipedia_future = executor.submit(get_wikipedia_data, normalized_sci)
-
-                    perenual_data2 = perenual_future.result()
-                    pixabay_data2 = pixabay_future.result()
-                    unsplash_data2 = unsplash_future.result()
-                    wikipedia_data2 = wikipedia_future.result()
-
-                images2 = (pixabay_data2 + unsplash_data2) if (pixabay_data2 or unsplash_data2) else []
+            if has_fallback:
+                speculative = fallback is not None
+                if fallback is None:
+                    fallback = start_sources(normalized_sci, priority, cache_only)
+                results2, incomplete2 = collect_sources(*fallback, deadline)
+                if speculative and 'rate_limited' in incomplete2.values():
+                    # La reserva de segundo plano estaba agotada: ahora sí hace
+                    # falta, así que se repite con la prioridad de la búsqueda
+                    results2, incomplete2 = collect_sources(
+                        *start_sources(normalized_sci, priority, cache_only), deadline
+                    )
+                if 'uncached' in incomplete2.values():
+                    yield 'result', UNCACHED_RESULT, 202, {}
+                    return
+                incomplete.update(incomplete2)
+                perenual_data2 = results2['perenual']
+                pixabay_data2 = results2['pixabay']
+                unsplash_data2 = results2['unsplash']
+                wikipedia_data2 = results2['wikipedia']
+
+                images2 = live_images(pixabay_data2 + unsplash_data2) if (pixabay_data2 or unsplash_data2) else []
 
                 if any([perenual_data2, pixabay_data2, unsplash_data2, wikipedia_data2]):
                     combined_data = {
@@ -608,34 +2862,1377 @@ def search():
                         'wikipedia': wikipedia_data2,
                         'query': query,
                         'normalized_query': normalized_sci,
-                        'sources': {
-                            'perenual': bool(perenual_data2),
-                            'pixabay': bool(pixabay_data2),
-                            'unsplash': bool(unsplash_data2),
-                            'wikipedia': bool(wikipedia_data2)
-                        }
+                        'sources': source_statuses(results2, incomplete2)
                     }
-                    return jsonify(combined_data)
+                    yield 'result', combined_data, 200, {}
+                    return
+
+            if 'timeout' in incomplete.values():
+                yield 'result', {
+                    'error': 'Las fuentes tardaron demasiado en responder, intenta de nuevo',
+                    'suggestions': [],
+                    'sources': source_statuses(results, incomplete)
+                }, 504, {}
+                return
+            if incomplete:
+                yield 'result', {
+                    'error': 'Algunas fuentes no están disponibles en este momento, intenta más tarde',
+                    'suggestions': [],
+                    'sources': source_statuses(results, incomplete)
+                }, 503, {}
+                return
 
-            return jsonify({
+            yield 'result', {
                 'error': 'No se encontraron resultados para flores con ese nombre',
                 'suggestions': generate_suggestions(normalized_query)
-            }), 404
+            }, 404, {}
+            return
 
-        return jsonify(combined_data)
+        yield 'result', combined_data, 200, {}
 
+    except ExecutorSaturated as e:
+        app.logger.warning(f"Búsqueda rechazada: {str(e)}")
+        yield 'result', {'error': 'El servicio está ocupado, intenta de nuevo en unos segundos'}, 503, {'Retry-After': '2'}
     except Exception as e:
         app.logger.error(f"Error en la búsqueda: {str(e)}")
-        return jsonify({'error': 'Ocurrió un error al buscar información sobre la flor'}), 500
+        yield 'result', {'error': 'Ocurrió un error al buscar información sobre la flor'}, 500, {}
+
+def run_search(query, priority=PRIORITY_INTERACTIVE, budget=None, cache_only=False):
+    """Ejecuta la búsqueda completa y devuelve (payload, código HTTP, cabeceras)"""
+    for event in iter_search(query, priority, budget, cache_only):
+        if event[0] == 'result':
+            return event[1:]
+
+# Campos de /search que pinta la interfaz. wikipedia.summary ya va dentro de
+# plant_info.description (enhance_plant_data) y wikipedia.extract no se usa.
+SEARCH_PROFILES = {
+    'compact': (
+        'query', 'normalized_query', 'sources', 'images', 'thumbnails',
+        'plant_info.name', 'plant_info.scientific_name', 'plant_info.description',
+        'plant_info.cycle', 'plant_info.watering', 'plant_info.sunlight', 'plant_info.care',
+        'wikipedia.title', 'wikipedia.url'
+    ),
+    'full': None
+}
+SEARCH_DEFAULT_PROFILE = os.getenv('SEARCH_DEFAULT_PROFILE', 'compact')
+SEARCH_MAX_FIELDS = 40
+
+# Datos de cada fuente en los mensajes progresivos (se muestran antes del resultado final)
+SOURCE_FRAME_FIELDS = {
+    'perenual': tuple(f.split('.', 1)[1] for f in SEARCH_PROFILES['compact'] if f.startswith('plant_info.')),
+    'wikipedia': ('title', 'summary', 'url')
+}
+
+def parse_fields(raw):
+    """
+    Convierte el parámetro fields= en una tupla de rutas ('plant_info.name',
+    'images', ...), o None para el payload completo. Acepta un perfil
+    (compact, full) o una lista separada por comas.
+    """
+    raw = (raw or '').strip() or SEARCH_DEFAULT_PROFILE
+    if raw in SEARCH_PROFILES:
+        return SEARCH_PROFILES[raw]
+    fields = tuple(
+        field for field in (part.strip() for part in raw.split(',')[:SEARCH_MAX_FIELDS])
+        if re.fullmatch(r'[a-z_]+(\.[a-z_]+)*', field)
+    )
+    return fields or SEARCH_PROFILES[SEARCH_DEFAULT_PROFILE]
+
+def select_fields(data, fields):
+    """Copia de data con solo las rutas pedidas; omite las que no existen o son None"""
+    if fields is None or not isinstance(data, dict):
+        return data
+    selected = {}
+    nested = {}
+    for field in fields:
+        head, _, rest = field.partition('.')
+        if rest:
+            nested.setdefault(head, []).append(rest)
+        elif data.get(head) is not None:
+            selected[head] = data[head]
+    for head, rests in nested.items():
+        if head not in selected and isinstance(data.get(head), dict):
+            selected[head] = select_fields(data[head], rests)
+    return selected
+
+def thumbnail_url(image_url):
+    """URL firmada de la miniatura en /img"""
+    return url_for('image_thumbnail', signature=image_proxy.signature(image_url), u=image_url)
+
+def thumbnail_urls(image_urls):
+    """Miniaturas alineadas con images; sin proxy (o de un host no permitido), las URLs originales"""
+    if image_proxy is None:
+        return list(image_urls)
+    return [
+        thumbnail_url(image_url) if image_proxy.allowed(image_url) else image_url
+        for image_url in image_urls
+    ]
+
+def shape_payload(payload, status_code, fields):
+    """Aplica fields= a las respuestas correctas; los errores se envían completos"""
+    if status_code != 200:
+        return payload
+    if payload.get('images'):
+        payload = {**payload, 'thumbnails': thumbnail_urls(payload['images'])}
+    return select_fields(payload, fields)
+
+# Registro de búsquedas (tabla busquedas): escritura diferida en lotes
+SEARCH_LOG_ENABLED = os.getenv('SEARCH_LOG_ENABLED', '1') == '1'
+SEARCH_LOG_QUEUE_SIZE = int(os.getenv('SEARCH_LOG_QUEUE_SIZE', 10000))
+SEARCH_LOG_BATCH_SIZE = int(os.getenv('SEARCH_LOG_BATCH_SIZE', 200))
+SEARCH_LOG_FLUSH_SECONDS = float(os.getenv('SEARCH_LOG_FLUSH_SECONDS', 2))
+
+def utc_now():
+    """Fecha UTC sin zona horaria, como se guarda en las columnas DATETIME"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class SearchLog:
+    """
+    Registro de búsquedas con escritura diferida: record() solo encola y
+    nunca espera a MySQL. Un hilo de fondo vacía la cola cada flush_seconds
+    (o al juntar batch_size filas) con un único INSERT de varias filas. Si la
+    cola está llena la búsqueda no se registra y se cuenta en dropped.
+    """
+
+    COLUMNS = ('consulta', 'consulta_normalizada', 'fuentes', 'codigo', 'modo', 'latencia_ms', 'creado_en')
+
+    def __init__(self, connect, queue_size, batch_size, flush_seconds):
+        self.connect = connect
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def record(self, row):
+        """Encola una fila con los valores de COLUMNS"""
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _ensure_writer(self):
+        # Un hilo escritor por proceso (tras el fork el del maestro no existe)
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name='search-log', daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._write(self._take())
+
+    def _take(self):
+        """Espera la primera fila y junta las que lleguen hasta flush_seconds o batch_size"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self):
+        """Escribe ya lo que quede en la cola (al terminar el proceso)"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(batch), self.batch_size):
+            self._write(batch[start:start + self.batch_size])
+
+    def _write(self, rows):
+        placeholders = f"({', '.join(['%s'] * len(self.COLUMNS))})"
+        sql = (
+            f"INSERT INTO busquedas ({', '.join(self.COLUMNS)}) VALUES "
+            + ', '.join([placeholders] * len(rows))
+        )
+        try:
+            conn = self.connect()
+            try:
+                cur = conn.cursor()
+                try:
+                    cur.execute(sql, [value for row in rows for value in row])
+                    conn.commit()
+                finally:
+                    cur.close()
+            finally:
+                conn.close()
+        except Exception as e:
+            # Un fallo de MySQL nunca afecta a las búsquedas: se pierde el lote
+            with self._lock:
+                self.failed += len(rows)
+            app.logger.warning(f"No se pudo guardar el registro de búsquedas: {str(e)}")
+            return
+        with self._lock:
+            self.written += len(rows)
+
+    def top(self, limit, window_hours):
+        """
+        Nombres normalizados más buscados en las últimas window_hours:
+        [(nombre, búsquedas)]. Cuenta las respuestas de /search con datos o
+        parciales (200, 503, 504); las que no son flores o no existen no se
+        refrescan, y las de /api/flowers (modo 'api') no cuentan.
+        """
+        since = utc_now() - timedelta(hours=window_hours)
+        conn = self.connect()
+        try:
+            cur = conn.cursor()
+            try:
+                cur.execute(
+                    "SELECT consulta_normalizada, COUNT(*) AS veces FROM busquedas "
+                    "WHERE creado_en >= %s AND codigo IN (200, 503, 504) AND modo IN ('json', 'stream') "
+                    "GROUP BY consulta_normalizada ORDER BY veces DESC LIMIT %s",
+                    (since, limit)
+                )
+                rows = cur.fetchall()
+            finally:
+                cur.close()
+        finally:
+            conn.close()
+        return [(name, count) for name, count in rows]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': self._queue.qsize(),
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed
+            }
+
+
+search_log = (
+    SearchLog(get_db_connection, SEARCH_LOG_QUEUE_SIZE, SEARCH_LOG_BATCH_SIZE, SEARCH_LOG_FLUSH_SECONDS)
+    if SEARCH_LOG_ENABLED else None
+)
+if search_log is not None:
+    atexit.register(search_log.flush)
+
+def _record_search(query, payload, status_code, mode, started, log=True):
+    """Métricas de la búsqueda; con log=False no se guarda en busquedas"""
+    elapsed = time.monotonic() - started
+    metrics.inc('search_responses_total', code=status_code, mode=mode)
+    metrics.observe('search_seconds', elapsed)
+    if search_log is None or not query or not log:
+        return
+    sources = payload.get('sources')
+    search_log.record((
+        query[:255],
+        (payload.get('normalized_query') or normalize_flower_name(query))[:255],
+        json.dumps(sources, separators=(',', ':')) if sources else None,
+        status_code,
+        mode,
+        int(elapsed * 1000),
+        utc_now()
+    ))
+
+def _search_frame(event, fields):
+    if event[0] == 'source':
+        _, source, value, status = event
+        if fields is not None and source in SOURCE_FRAME_FIELDS:
+            value = select_fields(value, SOURCE_FRAME_FIELDS[source])
+        frame = {'type': 'source', 'source': source, 'status': status, 'data': value}
+        if source in IMAGE_SOURCES and value:
+            frame['data'] = live_images(value)
+            frame['thumbnails'] = thumbnail_urls(frame['data'])
+    else:
+        _, payload, status_code, _ = event
+        frame = {'type': 'result', 'status': status_code, **shape_payload(payload, status_code, fields)}
+    return app.json.dumps(frame) + '\n'
+
+@app.route("/search", methods=["POST"])
+@login_required
+def search():
+    query = request.form.get('query', '').strip()
+    fields = parse_fields(request.values.get('fields'))
+
+    streaming = (
+        request.form.get('stream') == '1' or
+        'application/x-ndjson' in request.headers.get('Accept', '')
+    )
+    started = time.monotonic()
+    if not streaming:
+        payload, status_code, headers = run_search(query)
+        _record_search(query, payload, status_code, 'json', started)
+        return jsonify(shape_payload(payload, status_code, fields)), status_code, headers
+
+    # Modo progresivo (NDJSON): una línea por fuente en cuanto responde y una
+    # última línea 'result' con la respuesta combinada
+    events = iter_search(query)
+    first = next(events)
+    if first[0] == 'result':
+        # Validación fallida: no hay nada que transmitir
+        _record_search(query, first[1], first[2], 'stream', started)
+        return jsonify(first[1]), first[2], first[3]
+
+    def generate():
+        yield _search_frame(first, fields)
+        for event in events:
+            if event[0] == 'result':
+                _record_search(query, event[1], event[2], 'stream', started)
+            yield _search_frame(event, fields)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# Recurso GET cacheable por navegadores, nginx y CDN: mismo contenido que /search
+FLOWER_API_MAX_AGE = int(os.getenv('FLOWER_API_MAX_AGE', 300))
+FLOWER_API_STALE_WHILE_REVALIDATE = int(os.getenv('FLOWER_API_STALE_WHILE_REVALIDATE', 86400))
+FLOWER_API_NEGATIVE_MAX_AGE = int(os.getenv('FLOWER_API_NEGATIVE_MAX_AGE', 60))
+FLOWER_API_REQUIRE_LOGIN = os.getenv('FLOWER_API_REQUIRE_LOGIN', '0') == '1'
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+
+def flower_cache_control(status_code, payload):
+    """
+    Resultados completos: max-age largo y stale-while-revalidate. 400/404: poco
+    tiempo. Resultados parciales (fuentes con timeout o no disponibles) y
+    errores no se guardan para no fijar una respuesta degradada.
+    """
+    scope = 'private' if FLOWER_API_REQUIRE_LOGIN else 'public'
+    if status_code == 200 and all(isinstance(status, bool) for status in payload.get('sources', {}).values()):
+        return (
+            f'{scope}, max-age={FLOWER_API_MAX_AGE}, '
+            f'stale-while-revalidate={FLOWER_API_STALE_WHILE_REVALIDATE}, '
+            f'stale-if-error={FLOWER_API_STALE_WHILE_REVALIDATE}'
+        )
+    if status_code in (400, 404):
+        return f'{scope}, max-age={FLOWER_API_NEGATIVE_MAX_AGE}'
+    return 'no-store'
+
+def negotiate_encoding():
+    """Codificación preferida que acepta el cliente: br (si está instalado brotli), gzip o ninguna"""
+    for encoding in ('br', 'gzip'):
+        if encoding == 'br' and brotli is None:
+            continue
+        if request.accept_encodings.quality(encoding) > 0:
+            return encoding
+    return None
+
+@lru_cache(maxsize=256)
+def compress_body(body, encoding):
+    """Comprime una respuesta; memorizada porque las mismas flores se piden una y otra vez"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    # mtime=0 para que el mismo contenido genere siempre los mismos bytes
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+@app.route("/api/flowers/<name>")
+def flower_resource(name):
+    if FLOWER_API_REQUIRE_LOGIN and "usuario" not in session:
+        return jsonify({'error': 'Inicia sesión para consultar la API'}), 401
+
+    started = time.monotonic()
+    query = name.strip()
+    # Sin sesión solo se sirve lo que ya está en caché: un cliente anónimo no
+    # puede gastar la cuota de las APIs (202 sin cachear si falta algo)
+    anonymous = "usuario" not in session
+    payload, status_code, headers = run_search(query, cache_only=anonymous)
+    # El tráfico anónimo no se registra: no debe decidir qué flores se refrescan
+    _record_search(query, payload, status_code, 'api', started, log=not anonymous)
+    payload = shape_payload(payload, status_code, parse_fields(request.args.get('fields')))
+
+    body = app.json.dumps(payload).encode('utf-8')
+    cache_control = flower_cache_control(status_code, payload)
+    encoding = negotiate_encoding() if len(body) >= COMPRESS_MIN_BYTES else None
+
+    response_headers = {
+        'Cache-Control': cache_control,
+        'Vary': 'Accept-Encoding, Cookie' if FLOWER_API_REQUIRE_LOGIN else 'Accept-Encoding',
+        **headers
+    }
+    # ETag fuerte por representación: cada codificación tiene sus propios bytes
+    etag = None
+    if cache_control != 'no-store':
+        etag = hashlib.sha256(body).hexdigest()[:32] + (f'-{encoding}' if encoding else '')
+        if status_code == 200 and request.if_none_match.contains_weak(etag):
+            response = Response(status=304, headers=response_headers)
+            response.set_etag(etag)
+            return response
+
+    if encoding:
+        body = compress_body(body, encoding)
+        response_headers['Content-Encoding'] = encoding
+
+    response = Response(body, status=status_code, mimetype='application/json', headers=response_headers)
+    if etag:
+        response.set_etag(etag)
+    return response
+
+if not FLOWER_API_REQUIRE_LOGIN:
+    SESSIONLESS_ENDPOINTS.add('flower_resource')
+
+@app.route("/img/<signature>")
+def image_thumbnail(signature):
+    """Miniatura de una imagen de la galería; u= es la URL original firmada"""
+    image_url = request.args.get('u', '')
+    if image_proxy is None or not image_url or not hmac.compare_digest(signature, image_proxy.signature(image_url)):
+        return jsonify({'error': 'Imagen no encontrada'}), 404
+    try:
+        path = image_proxy.thumbnail(image_url)
+    except ImageUnavailable as e:
+        if e.dead:
+            return jsonify({'error': 'Imagen no disponible'}), 404, {'Cache-Control': 'public, max-age=3600'}
+        # Fallo pasajero: el navegador carga la original como antes
+        app.logger.warning(f"Miniatura no disponible: {str(e)}")
+        return redirect(image_url), 302, {'Cache-Control': 'no-store'}
+
+    with open(path, 'rb') as f:
+        mimetype = sniff_image_type(f.read(16)) or 'application/octet-stream'
+    response = send_file(path, mimetype=mimetype, etag=image_proxy.key(image_url),
+                         max_age=IMAGE_PROXY_MAX_AGE, conditional=True)
+    # El contenido de una URL firmada no cambia nunca
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+SESSIONLESS_ENDPOINTS.add('image_thumbnail')
+
+def batch_queries():
+    """Lista de consultas de /search/batch: JSON {"queries": [...]} o una lista JSON"""
+    body = request.get_json(silent=True)
+    if isinstance(body, dict):
+        body = body.get('queries')
+    if body is None:
+        body = request.form.getlist('queries')
+    if not isinstance(body, list) or not all(isinstance(query, str) for query in body):
+        return None
+    return [query.strip()[:100] for query in body]
+
+def iter_batch(groups, fields):
+    """
+    Busca cada nombre normalizado una sola vez en batch_executor, con prioridad
+    de segundo plano, y genera (nombre, consultas, código HTTP, payload) por
+    orden de llegada. Nunca hay más de BATCH_CONCURRENCY nombres en curso.
+    """
+    waiting = deque(groups.items())
+    running = {}
+    while waiting or running:
+        while waiting and len(running) < BATCH_CONCURRENCY:
+            normalized, queries = waiting[0]
+            try:
+                future = batch_executor.submit(run_search, queries[0], PRIORITY_BACKGROUND, BATCH_BUDGET_SECONDS)
+            except ExecutorSaturated:
+                # El pool lo comparten todos los lotes: se espera a que termine uno propio
+                if not running:
+                    time.sleep(0.1)
+                break
+            waiting.popleft()
+            running[future] = (normalized, queries)
+        if not running:
+            continue
+
+        done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+        for future in done:
+            normalized, queries = running.pop(future)
+            try:
+                payload, status_code, _ = future.result()
+            except Exception as e:
+                app.logger.error(f"Error en la búsqueda por lotes de {normalized}: {str(e)}")
+                payload, status_code = {'error': 'Ocurrió un error al buscar información sobre la flor'}, 500
+            yield normalized, queries, status_code, shape_payload(payload, status_code, fields)
+
+def _batch_line(name, queries, status_code, payload):
+    return app.json.dumps({
+        'type': 'result', **payload,
+        'normalized_query': name, 'queries': queries, 'status': status_code
+    }) + '\n'
+
+@app.route("/search/batch", methods=["POST"])
+@login_required
+def search_batch():
+    """
+    Búsqueda de muchos nombres en una sola petición (sincronizaciones nocturnas).
+    Responde NDJSON: una línea por nombre normalizado con las consultas que lo
+    pedían y una última línea con el resumen del lote.
+    """
+    queries = batch_queries()
+    if queries is None:
+        return jsonify({'error': 'Envía {"queries": ["rosa", ...]}'}), 400
+    if len(queries) > BATCH_MAX_QUERIES:
+        return jsonify({'error': f'Como mucho {BATCH_MAX_QUERIES} consultas por lote'}), 413
+
+    body = request.get_json(silent=True)
+    fields = parse_fields((body.get('fields') if isinstance(body, dict) else None) or request.values.get('fields'))
+
+    # Las consultas no válidas se responden sin pasar por el pool
+    groups, rejected = {}, {}
+    for query in queries:
+        normalized = normalize_flower_name(query) if len(query) >= 2 else None
+        if normalized and is_flower_related(normalized):
+            groups.setdefault(normalized, []).append(query)
+        else:
+            rejected.setdefault(normalized or query, []).append(query)
+
+    def generate():
+        started = time.monotonic()
+        codes = Counter()
+        for name, group in rejected.items():
+            payload, status_code, _ = run_search(group[0])
+            codes[status_code] += 1
+            yield _batch_line(name, group, status_code, payload)
+        for name, group, status_code, payload in iter_batch(groups, fields):
+            codes[status_code] += 1
+            metrics.inc('search_responses_total', code=status_code, mode='batch')
+            yield _batch_line(name, group, status_code, payload)
+        yield app.json.dumps({
+            'type': 'summary',
+            'queries': len(queries),
+            'unique': len(groups) + len(rejected),
+            'statuses': {str(code): count for code, count in sorted(codes.items())},
+            'elapsed_ms': round((time.monotonic() - started) * 1000, 1)
+        }) + '\n'
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+HEALTH_DB_TIMEOUT = int(os.getenv('HEALTH_DB_TIMEOUT', 2))
+HEALTH_CACHE_SECONDS = float(os.getenv('HEALTH_CACHE_SECONDS', 5))
+# Sin token, /metrics y el detalle de /health no se sirven
+MONITORING_TOKEN = os.getenv('MONITORING_TOKEN', '')
+
+_health_state = {'result': None, 'checked_at': None}
+_health_lock = threading.Lock()
+
+def connect_health_db():
+    """Conexión propia para el health check: no espera detrás de los logins en el pool"""
+    return mysql_connector.connect(**DB_CONFIG, connection_timeout=HEALTH_DB_TIMEOUT)
+
+def check_database():
+    """
+    Devuelve (alcanzable, detalle) haciendo un SELECT 1 con una conexión
+    dedicada; el resultado se reutiliza HEALTH_CACHE_SECONDS para que sondas
+    frecuentes no abran una conexión por petición.
+    """
+    with _health_lock:
+        checked_at = _health_state['checked_at']
+        if checked_at is not None and time.monotonic() - checked_at < HEALTH_CACHE_SECONDS:
+            return _health_state['result']
+
+        started = time.monotonic()
+        try:
+            conn = connect_health_db()
+            try:
+                cur = conn.cursor()
+                cur.execute("SELECT 1")
+                cur.fetchall()
+                cur.close()
+            finally:
+                conn.close()
+        except Exception as e:
+            # El detalle (host, usuario, esquema) solo va al log
+            app.logger.error(f"Health check de MySQL fallido: {str(e)}")
+            result = False, {'reachable': False, 'error': 'unreachable'}
+        else:
+            result = True, {'reachable': True, 'latency_ms': round((time.monotonic() - started) * 1000, 1)}
+        _health_state['result'] = result
+        _health_state['checked_at'] = time.monotonic()
+        return result
+
+def monitoring_authorized():
+    """True si la petición trae "Authorization: Bearer <MONITORING_TOKEN>" """
+    if not MONITORING_TOKEN:
+        return False
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(token.encode(), MONITORING_TOKEN.encode())
 
 @app.route("/health")
 def health():
-    return jsonify({"status": "ok"})
+    """
+    Readiness: 503 si MySQL no responde o todas las APIs externas tienen el
+    circuito abierto; 'degraded' si solo algunas están abiertas (las búsquedas
+    responden con resultados parciales). Sin el token de monitorización solo
+    se devuelve el estado.
+    """
+    db_ok, db_detail = check_database()
+    open_sources = [source for source, breaker in breakers.items() if breaker.is_open()]
 
-if __name__ == '__main__':
-   
+    if not db_ok or len(open_sources) == len(breakers):
+        status = 'unavailable'
+    elif open_sources:
+        status = 'degraded'
+    else:
+        status = 'ok'
+    status_code = 503 if status == 'unavailable' else 200
+
+    if not monitoring_authorized():
+        return jsonify({"status": status}), status_code
+
+    return jsonify({
+        "status": status,
+        "checks": {
+            "database": db_detail,
+            "upstreams": {
+                source: 'open' if source in open_sources else 'ok' for source in breakers
+            }
+        },
+        "startup": STARTUP_REPORT,
+        "cache": result_cache.stats(),
+        "shared_cache": shared_store.stats() if shared_store is not None else None,
+        "search_log": search_log.stats() if search_log is not None else None,
+        "image_cache": image_proxy.stats() if image_proxy is not None else None,
+        "coalesced_lookups": inflight.coalesced,
+        "search_executor_pending": search_executor.pending(),
+        "db_pool": db_pool.stats(),
+        "breakers": {source: breaker.snapshot() for source, breaker in breakers.items()},
+        "rate_limits": {source: limiter.snapshot() for source, limiter in rate_limiters.items()}
+    }), status_code
+
+BREAKER_STATE_VALUES = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+
+metrics.gauge('executor_pending', 'Tareas en ejecución o en cola por pool de hilos', lambda: {
+    (('pool', 'search'),): search_executor.pending(),
+    (('pool', 'bcrypt'),): hash_executor.pending(),
+    (('pool', 'image'),): image_executor.pending()
+})
+metrics.gauge('db_pool_connections', 'Conexiones del pool de MySQL por estado', lambda: {
+    (('state', 'in_use'),): db_pool.stats()['in_use'],
+    (('state', 'idle'),): db_pool.stats()['idle']
+})
+metrics.gauge('breaker_state', 'Estado del circuit breaker por API (0 cerrado, 1 semiabierto, 2 abierto)', lambda: {
+    (('source', source),): BREAKER_STATE_VALUES[breaker.snapshot()['state']]
+    for source, breaker in breakers.items()
+})
+metrics.gauge('upstream_timeout_seconds', 'Timeout adaptativo vigente por API', lambda: {
+    (('source', source),): round(breaker.timeout(), 3) for source, breaker in breakers.items()
+})
+metrics.gauge('cache_lookups', 'Aciertos y fallos acumulados de la caché de resultados', lambda: {
+    (('result', 'hit'),): result_cache.stats()['hits'],
+    (('result', 'miss'),): result_cache.stats()['misses']
+})
+metrics.gauge('cache_entries', 'Entradas en la caché de resultados', lambda: {
+    (): result_cache.stats()['entries']
+})
+metrics.gauge('shared_cache_lookups', 'Aciertos, fallos y esperas a otro proceso en la caché compartida', lambda: {
+    (('result', 'hit'),): shared_store.hits,
+    (('result', 'miss'),): shared_store.misses,
+    (('result', 'waited_for_peer'),): shared_store.waited
+} if shared_store is not None else {})
+metrics.gauge('search_log_rows', 'Filas del registro de búsquedas por estado', lambda: {
+    (('state', state),): value for state, value in search_log.stats().items()
+} if search_log is not None else {})
+metrics.gauge('image_cache_lookups', 'Aciertos, fallos y URLs rotas de la caché de miniaturas', lambda: {
+    (('result', 'hit'),): image_proxy.hits,
+    (('result', 'miss'),): image_proxy.misses,
+    (('result', 'dead'),): image_proxy.dead
+} if image_proxy is not None else {})
+metrics.gauge('coalesced_lookups', 'Consultas agrupadas con otra idéntica en curso', lambda: {
+    (): inflight.coalesced
+})
+
+@app.route("/metrics")
+def metrics_endpoint():
+    if not monitoring_authorized():
+        return jsonify({'error': 'No autorizado'}), 401, {'WWW-Authenticate': 'Bearer'}
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Recursos estáticos versionados. `flask --app app build-assets` minifica el
+# CSS y el JS de static/ y los copia a static/dist con el hash del contenido en
+# el nombre, junto con sus variantes .gz/.br; las dependencias descargadas en
+# static/vendor se copian por paquete a una carpeta con el hash del paquete
+# para que sus rutas relativas (fuentes, iconos) sigan valiendo. En producción
+# las plantillas enlazan esas copias, servidas desde /assets como inmutables;
+# sin construir se usan los archivos originales y los CDN.
+ASSET_DIST_DIR = os.path.join(app.static_folder, 'dist')
+ASSET_VENDOR_DIR = os.path.join(app.static_folder, 'vendor')
+ASSET_MANIFEST_PATH = os.path.join(ASSET_DIST_DIR, 'manifest.json')
+ASSET_MAX_AGE = int(os.getenv('ASSET_MAX_AGE', 365 * 24 * 3600))
+ASSET_COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.map', '.ttf', '.eot', '.txt')
+ASSET_HASH_LENGTH = 10
+
+# Dependencias de los CDN: paquete -> (URL base, archivos que enlazan las plantillas)
+VENDOR_PACKAGES = {
+    'bootstrap': ('https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/',
+                  ('css/bootstrap.min.css', 'js/bootstrap.bundle.min.js')),
+    'bootstrap-icons': ('https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.0/font/', ('bootstrap-icons.css',)),
+    'leaflet': ('https://unpkg.com/leaflet@1.9.4/dist/', ('leaflet.css', 'leaflet.js')),
+    'font-awesome': ('https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/', ('css/all.min.css',))
+}
+VENDOR_CDN = {
+    f'vendor/{package}/{path}': base_url + path
+    for package, (base_url, paths) in VENDOR_PACKAGES.items() for path in paths
+}
+
+ASSET_MANIFEST = {}
+
+_CSS_TOKENS = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/', re.DOTALL)
+_CSS_URL = re.compile(r'url\(\s*[\'"]?([^\'")]+?)[\'"]?\s*\)')
+
+def _squeeze_css(code):
+    code = re.sub(r'\s+', ' ', code)
+    code = re.sub(r'\s*([{};,>])\s*', r'\1', code)
+    code = re.sub(r':\s+', ':', code)
+    return code.replace(';}', '}')
+
+def minify_css(text):
+    """Quita comentarios y espacios sobrantes del CSS sin tocar las cadenas (rcssmin si está instalado)"""
+    if rcssmin is not None:
+        return rcssmin.cssmin(text)
+    parts = []
+    position = 0
+    for match in _CSS_TOKENS.finditer(text):
+        parts.append(_squeeze_css(text[position:match.start()]))
+        if match.group(1):
+            parts.append(match.group(1))
+        position = match.end()
+    parts.append(_squeeze_css(text[position:]))
+    return ''.join(parts).strip() + '\n'
+
+_JS_REGEX_AFTER = set('(,=:[!&|?{};+-*%<>~^')
+_JS_REGEX_KEYWORDS = {
+    'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete',
+    'void', 'throw', 'instanceof', 'yield', 'await'
+}
+# Un salto de línea se puede quitar después o antes de estos caracteres sin
+# cambiar la inserción automática de ';'
+_JS_JOIN_AFTER = set('{;,([')
+_JS_JOIN_BEFORE = set('})].,;:?')
+
+def _js_word(char):
+    return char.isalnum() or char in '_$\\'
+
+def minify_js(text):
+    """
+    Quita comentarios, sangría, espacios y líneas vacías del JavaScript sin
+    tocar cadenas, plantillas ni expresiones regulares (rjsmin si está
+    instalado). Los saltos de línea que pueden importar para la inserción
+    automática de ';' se conservan.
+    """
+    if rjsmin is not None:
+        return rjsmin.jsmin(text)
+
+    out = []
+    templates = []  # profundidad de llaves de cada ${ abierto
+    depth = 0
+    pending = None  # separador pendiente: None, ' ' o '\n'
+    i, n = 0, len(text)
+
+    def emit(token):
+        nonlocal pending
+        if pending and out:
+            prev, nxt = out[-1][-1], token[0]
+            if pending == '\n' and prev not in _JS_JOIN_AFTER and nxt not in _JS_JOIN_BEFORE:
+                out.append('\n')
+            elif (_js_word(prev) and _js_word(nxt)) or (prev in '+-' and nxt in '+-'):
+                out.append(' ')
+        pending = None
+        out.append(token)
+
+    def regex_allowed():
+        if not out:
+            return True
+        last = out[-1]
+        if _js_word(last[-1]):
+            return last in _JS_REGEX_KEYWORDS
+        return last[-1] in _JS_REGEX_AFTER
+
+    while i < n:
+        c = text[i]
+        if c == '`' or (c == '}' and templates and depth == templates[-1]):
+            # Trozo literal de una plantilla: hasta el ` final o el siguiente ${
+            if c == '}':
+                templates.pop()
+            j = i + 1
+            while j < n:
+                if text[j] == '\\':
+                    j += 2
+                elif text[j] == '`':
+                    j += 1
+                    break
+                elif text.startswith('${', j):
+                    j += 2
+                    templates.append(depth)
+                    break
+                else:
+                    j += 1
+            emit(text[i:j])
+            i = j
+        elif c in '"\'':
+            j = i + 1
+            while j < n and text[j] != c and text[j] != '\n':
+                j += 2 if text[j] == '\\' else 1
+            emit(text[i:j + 1])
+            i = j + 1
+        elif text.startswith('//', i):
+            j = text.find('\n', i)
+            i = n if j < 0 else j
+        elif text.startswith('/*', i):
+            j = text.find('*/', i + 2)
+            j = n if j < 0 else j + 2
+            if pending != '\n':
+                pending = '\n' if '\n' in text[i:j] else ' '
+            i = j
+        elif c == '/' and regex_allowed():
+            j = i + 1
+            in_class = False
+            while j < n and text[j] != '\n':
+                if text[j] == '\\':
+                    j += 2
+                    continue
+                if text[j] == '[':
+                    in_class = True
+                elif text[j] == ']':
+                    in_class = False
+                elif text[j] == '/' and not in_class:
+                    break
+                j += 1
+            j += 1
+            while j < n and text[j].isalpha():
+                j += 1
+            emit(text[i:j])
+            i = j
+        elif c.isspace():
+            j = i
+            while j < n and text[j].isspace():
+                j += 1
+            pending = '\n' if pending == '\n' or '\n' in text[i:j] else ' '
+            i = j
+        elif _js_word(c):
+            j = i
+            while j < n and _js_word(text[j]):
+                j += 1
+            emit(text[i:j])
+            i = j
+        else:
+            if c == '{':
+                depth += 1
+            elif c == '}':
+                depth -= 1
+            emit(c)
+            i += 1
+    return ''.join(out).strip() + '\n'
+
+ASSET_MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+def precompress_asset(path, data):
+    """Escribe path.gz (y path.br si está brotli) cuando comprimir ahorra al menos un 10 %"""
+    variants = [('.gz', lambda body: gzip.compress(body, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', lambda body: brotli.compress(body, quality=11)))
+    for suffix, compress in variants:
+        compressed = compress(data)
+        if len(compressed) < len(data) * 0.9:
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+
+def _write_asset(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    if path.endswith(ASSET_COMPRESSIBLE) and len(data) >= 256:
+        precompress_asset(path, data)
+
+def _asset_files(directory):
+    """Rutas relativas (con /) de los archivos de directory, ordenadas"""
+    files = []
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            files.append(os.path.relpath(os.path.join(root, filename), directory).replace(os.sep, '/'))
+    return sorted(files)
+
+def build_assets(source_dir=None, output_dir=ASSET_DIST_DIR):
+    """
+    Genera output_dir a partir de static/ y guarda el manifiesto
+    {ruta original: ruta en dist}. Los nombres dependen solo del contenido,
+    así que volver a construir sin cambios no genera archivos nuevos y las
+    versiones anteriores siguen disponibles para las páginas ya abiertas.
+    """
+    source_dir = source_dir or app.static_folder
+    manifest = {}
+    for rel in _asset_files(source_dir):
+        if rel.split('/', 1)[0] in ('dist', 'vendor'):
+            continue
+        with open(os.path.join(source_dir, rel), 'rb') as f:
+            data = f.read()
+        stem, ext = os.path.splitext(rel)
+        minify = ASSET_MINIFIERS.get(ext)
+        if minify:
+            data = minify(data.decode('utf-8')).encode('utf-8')
+        manifest[rel] = f"{stem}.{hashlib.sha256(data).hexdigest()[:ASSET_HASH_LENGTH]}{ext}"
+        _write_asset(os.path.join(output_dir, manifest[rel]), data)
+
+    vendor_dir = os.path.join(source_dir, 'vendor')
+    packages = sorted(os.listdir(vendor_dir)) if os.path.isdir(vendor_dir) else []
+    for package in packages:
+        package_dir = os.path.join(vendor_dir, package)
+        if not os.path.isdir(package_dir):
+            continue
+        contents = {}
+        digest = hashlib.sha256()
+        for rel in _asset_files(package_dir):
+            with open(os.path.join(package_dir, rel), 'rb') as f:
+                contents[rel] = f.read()
+            digest.update(rel.encode('utf-8') + b'\0' + contents[rel])
+        versioned = f"vendor/{package}.{digest.hexdigest()[:ASSET_HASH_LENGTH]}"
+        for rel, data in contents.items():
+            manifest[f"vendor/{package}/{rel}"] = f"{versioned}/{rel}"
+            _write_asset(os.path.join(output_dir, versioned, rel), data)
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, 'manifest.json')
+    with open(f"{manifest_path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    return manifest
+
+def vendor_assets(vendor_dir=ASSET_VENDOR_DIR):
+    """
+    Descarga en vendor_dir los archivos de VENDOR_PACKAGES y lo que enlazan
+    sus CSS dentro del mismo paquete (fuentes, imágenes). Devuelve las rutas
+    descargadas.
+    """
+    http = build_http_session({'User-Agent': 'BloomHub/3.0'})
+    downloaded = []
+    for package, (base_url, paths) in VENDOR_PACKAGES.items():
+        pending = list(paths)
+        seen = set()
+        while pending:
+            rel = pending.pop()
+            if rel in seen:
+                continue
+            seen.add(rel)
+            response = http.get(base_url + rel, timeout=30)
+            response.raise_for_status()
+            target = os.path.join(vendor_dir, package, *rel.split('/'))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(response.content)
+            downloaded.append(f"vendor/{package}/{rel}")
+            if rel.endswith('.css'):
+                for ref in _CSS_URL.findall(response.text):
+                    if ref.startswith(('data:', '#')):
+                        continue
+                    absolute = urljoin(base_url + rel, ref).split('#')[0].split('?')[0]
+                    if absolute.startswith(base_url):
+                        pending.append(absolute[len(base_url):])
+    return downloaded
+
+def load_asset_manifest(path=ASSET_MANIFEST_PATH):
+    """Carga el manifiesto de build-assets; devuelve las entradas cargadas"""
     try:
-        init_db()
-    except Exception as e:
-        print("Aviso init_db:", e)
-    app.run(debug=True, port=int(os.getenv("PORT", 5000)))
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        app.logger.warning("No hay recursos construidos: se sirven sin versionar (flask --app app build-assets)")
+        return 0
+    except (OSError, ValueError) as e:
+        app.logger.error(f"No se pudo cargar el manifiesto de recursos: {str(e)}")
+        return 0
+    ASSET_MANIFEST.clear()
+    ASSET_MANIFEST.update(manifest)
+    return len(manifest)
+
+@app.template_global()
+def asset_url(name):
+    """URL de un recurso: la copia versionada si existe, si no el original (o el CDN para las dependencias)"""
+    built = ASSET_MANIFEST.get(name)
+    if built:
+        return url_for('built_asset', filename=built)
+    if name in VENDOR_CDN:
+        return VENDOR_CDN[name]
+    return url_for('static', filename=name)
+
+@app.route("/assets/<path:filename>")
+def built_asset(filename):
+    """Recursos de build-assets: nombre con hash, inmutables y precomprimidos"""
+    path = safe_join(ASSET_DIST_DIR, filename)
+    if (path is None or filename == 'manifest.json' or
+            filename.endswith(('.gz', '.br', '.tmp')) or not os.path.isfile(path)):
+        return jsonify({'error': 'Recurso no encontrado'}), 404
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding = None
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings.quality(candidate) > 0 and os.path.isfile(path + suffix):
+            encoding, path = candidate, path + suffix
+            break
+
+    response = send_file(path, mimetype=mimetype, max_age=ASSET_MAX_AGE, conditional=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if filename.endswith(ASSET_COMPRESSIBLE):
+        response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+SESSIONLESS_ENDPOINTS.update({'built_asset', 'static'})
+
+@app.cli.command("build-assets")
+@click.option("--vendor", is_flag=True, help="Descarga antes las dependencias de los CDN en static/vendor")
+def build_assets_command(vendor):
+    """Minifica y versiona los recursos estáticos en static/dist."""
+    if vendor:
+        downloaded = vendor_assets()
+        click.echo(f"{len(downloaded)} archivos descargados en {ASSET_VENDOR_DIR}")
+    manifest = build_assets()
+    for name, built in sorted(manifest.items()):
+        if name.startswith('vendor/') or not name.endswith(tuple(ASSET_MINIFIERS)):
+            continue
+        original = os.path.getsize(os.path.join(app.static_folder, name))
+        path = os.path.join(ASSET_DIST_DIR, built)
+        compressed = os.path.getsize(path + '.gz') if os.path.exists(path + '.gz') else os.path.getsize(path)
+        click.echo(f"{name:<24} {original / 1024:7.1f} KB -> {os.path.getsize(path) / 1024:7.1f} KB "
+                   f"({compressed / 1024:.1f} KB gzip)  {built}")
+    click.echo(f"{len(manifest)} recursos en {ASSET_DIST_DIR}")
+
+def catalog_names(include_scientific=True):
+    """Nombres normalizados de todas las flores conocidas (y sus nombres científicos)"""
+    names = set()
+    for flower in FLOWER_KEYWORDS | set(FLOWER_SYNONYMS.values()) | set(SCIENTIFIC_NAMES):
+        normalized = normalize_flower_name(flower)
+        if normalized:
+            names.add(normalized)
+        if include_scientific:
+            normalized_sci = normalize_flower_name(get_scientific_name(flower))
+            if normalized_sci:
+                names.add(normalized_sci)
+    return sorted(names)
+
+def warm_cache(names, rate=WARM_CACHE_RATE, report=None):
+    """
+    Precarga en caché todas las fuentes de cada nombre, como mucho `rate`
+    nombres por minuto y con prioridad baja para no gastar la reserva de cuota
+    de las búsquedas interactivas.
+    Devuelve un resumen con aciertos, nombres sin resultados y errores.
+    """
+    interval = 60.0 / rate if rate > 0 else 0.0
+    summary = {'total': len(names), 'found': 0, 'empty': 0, 'failed': 0, 'skipped': 0}
+    started = time.monotonic()
+
+    for position, name in enumerate(names, 1):
+        cycle_start = time.monotonic()
+        if all(result_cache.get(source, name, record=False)[0] for source in SOURCE_FETCHERS):
+            summary['skipped'] += 1
+            if report:
+                report(position, name, 'ya en caché', 0.0)
+            continue
+
+        try:
+            results, incomplete = fetch_all_sources(name, time.monotonic() + 60, PRIORITY_BACKGROUND)
+        except Exception as e:
+            summary['failed'] += 1
+            app.logger.error(f"Error al precargar {name}: {str(e)}")
+            if report:
+                report(position, name, f'error: {str(e)}', time.monotonic() - cycle_start)
+            continue
+
+        hits = [source for source, value in results.items() if value]
+        summary['found' if hits else 'empty'] += 1
+        if report:
+            status = ', '.join(hits) if hits else 'sin resultados'
+            if incomplete:
+                status += f" (sin respuesta: {', '.join(sorted(incomplete))})"
+            report(position, name, status, time.monotonic() - cycle_start)
+
+        remaining = interval - (time.monotonic() - cycle_start)
+        if remaining > 0 and position < len(names):
+            time.sleep(remaining)
+
+    summary['seconds'] = round(time.monotonic() - started, 1)
+    return summary
+
+@app.cli.command("warm-cache")
+@click.option("--rate", default=WARM_CACHE_RATE, show_default=True, help="Nombres por minuto")
+@click.option("--limit", default=0, help="Precargar solo los primeros N nombres")
+@click.option("--scientific/--no-scientific", default=True, show_default=True,
+              help="Incluir también los nombres científicos")
+@click.option("--output", default=CACHE_SNAPSHOT_PATH, show_default=True,
+              help="Archivo donde se guarda la caché")
+def warm_cache_command(rate, limit, scientific, output):
+    """Precarga Perenual, Wikipedia e imágenes de todas las flores conocidas."""
+    names = catalog_names(include_scientific=scientific)
+    if limit:
+        names = names[:limit]
+
+    click.echo(f"Entradas previas cargadas: {load_cache_snapshot(output)}")
+
+    def report(position, name, status, seconds):
+        click.echo(f"[{position}/{len(names)}] {name}: {status} ({seconds:.1f}s)")
+
+    summary = warm_cache(names, rate=rate, report=report)
+    saved = result_cache.dump(output)
+    click.echo(
+        f"Listo en {summary['seconds']}s: {summary['found']} con datos, "
+        f"{summary['empty']} sin resultados, {summary['failed']} con error, "
+        f"{summary['skipped']} ya en caché. {saved} entradas guardadas en {output}"
+    )
+
+@app.cli.command("ingest-species")
+@click.option("--start-page", default=1, show_default=True, help="Página del species-list por la que empezar")
+@click.option("--pages", default=0, help="Máximo de páginas a descargar (0 = hasta la última o agotar la cuota)")
+@click.option("--rate", default=30.0, show_default=True, help="Páginas por minuto")
+@click.option("--dump", "dump_path", default=None, help="Importar un volcado JSON en lugar de llamar a la API")
+def ingest_species_command(start_page, pages, rate, dump_path):
+    """Carga el species-list de Perenual en el índice local (tabla especies)."""
+    started = time.monotonic()
+
+    if dump_path:
+        with open(dump_path, encoding='utf-8') as f:
+            data = json.load(f)
+        plants = data.get('data', []) if isinstance(data, dict) else data
+        click.echo(f"Importadas {store_species(plants)} especies de {dump_path} "
+                   f"en {time.monotonic() - started:.1f}s")
+        return
+
+    interval = 60.0 / rate if rate > 0 else 0.0
+    page, stored, last_page = start_page, 0, None
+    while (not pages or page < start_page + pages) and (last_page is None or page <= last_page):
+        if not rate_limiters['perenual'].acquire(PRIORITY_BACKGROUND):
+            click.echo(f"Cuota de Perenual agotada; continúa más tarde con --start-page {page}")
+            break
+
+        cycle_start = time.monotonic()
+        response = http_sessions['perenual'].get(
+            APIS['perenual']['url'],
+            params={'key': APIS['perenual']['key'], 'page': page},
+            timeout=SOURCE_MAX_TIMEOUTS['perenual']
+        )
+        rate_limiters['perenual'].observe(response)
+        if response.status_code == 429:
+            click.echo(f"Perenual respondió 429; continúa más tarde con --start-page {page}")
+            break
+        response.raise_for_status()
+        data = response.json()
+
+        last_page = data.get('last_page', page)
+        stored += store_species(data.get('data', []))
+        click.echo(f"[{page}/{last_page}] {stored} especies guardadas")
+        page += 1
+
+        remaining = interval - (time.monotonic() - cycle_start)
+        if remaining > 0:
+            time.sleep(remaining)
+
+    click.echo(f"Listo en {time.monotonic() - started:.1f}s: {stored} especies guardadas")
+
+def _background_warmup():
+    summary = warm_cache(catalog_names())
+    app.logger.info(f"Precarga de caché terminada: {summary}")
+    try:
+        result_cache.dump(CACHE_SNAPSHOT_PATH)
+    except OSError as e:
+        app.logger.error(f"No se pudo guardar la caché: {str(e)}")
+
+# Refresco anticipado de los nombres más buscados (según la tabla busquedas)
+POPULAR_REFRESH_ENABLED = os.getenv('POPULAR_REFRESH_ENABLED', '1') == '1'
+POPULAR_TOP_N = int(os.getenv('POPULAR_TOP_N', 20))
+POPULAR_WINDOW_HOURS = float(os.getenv('POPULAR_WINDOW_HOURS', 24))
+POPULAR_REFRESH_INTERVAL = float(os.getenv('POPULAR_REFRESH_INTERVAL', 60))
+POPULAR_REFRESH_AHEAD_SECONDS = float(os.getenv('POPULAR_REFRESH_AHEAD_SECONDS', 300))
+
+def refresh_source(source, query, ahead=POPULAR_REFRESH_AHEAD_SECONDS):
+    """
+    Vuelve a consultar una fuente aunque su entrada siga vigente, con
+    prioridad de segundo plano. Con caché compartida, si otro proceso ya la
+    refrescó (le quedan más de `ahead` segundos) se copia su resultado y si
+    la está refrescando ahora se omite (devuelve False).
+    """
+    local_lookup = SOURCE_LOCAL_LOOKUPS.get(source)
+    value = local_lookup(query) if local_lookup else None
+    if value:
+        result_cache.set(source, query, value)
+        return True
+
+    if shared_store is None:
+        result_cache.set(source, query, _call_upstream(source, query, PRIORITY_BACKGROUND))
+        return True
+
+    found, value = shared_store.get(source, query, record=False, min_ttl=ahead)
+    if found:
+        result_cache.set(source, query, value)
+        return True
+    if not shared_store.try_lock(source, query):
+        return False
+    try:
+        value = _call_upstream(source, query, PRIORITY_BACKGROUND)
+        shared_store.set(source, query, value)
+    finally:
+        shared_store.unlock(source, query)
+    result_cache.set(source, query, value)
+    return True
+
+def refresh_popular(limit=POPULAR_TOP_N, window_hours=POPULAR_WINDOW_HOURS, ahead=POPULAR_REFRESH_AHEAD_SECONDS):
+    """
+    Refresca las fuentes de los nombres más buscados que faltan en caché o
+    caducan en menos de `ahead` segundos, para que esas búsquedas nunca
+    esperen a una API. Las entradas vacías vigentes se dejan caducar.
+    """
+    summary = {'names': 0, 'refreshed': 0, 'skipped': 0, 'failed': 0}
+    for name, _ in search_log.top(limit, window_hours):
+        summary['names'] += 1
+        for source in SOURCE_FETCHERS:
+            remaining, has_data = result_cache.expires_in(source, name)
+            if remaining is not None and (remaining > ahead or not has_data):
+                continue
+            if breakers[source].is_open():
+                outcome = 'skipped'
+            else:
+                try:
+                    outcome = 'refreshed' if refresh_source(source, name, ahead) else 'skipped'
+                except (UpstreamError, SourceUnavailable, RateLimited, sqlite3.Error) as e:
+                    app.logger.warning(f"No se pudo refrescar {source} para '{name}': {str(e)}")
+                    outcome = 'failed'
+            summary[outcome] += 1
+            metrics.inc('popular_refresh_total', source=source, outcome=outcome)
+    return summary
+
+def _popularity_refresher():
+    while True:
+        time.sleep(POPULAR_REFRESH_INTERVAL)
+        try:
+            summary = refresh_popular()
+        except Exception as e:
+            app.logger.warning(f"Refresco de populares fallido: {str(e)}")
+            continue
+        if summary['refreshed'] or summary['failed']:
+            app.logger.info(f"Refresco de populares: {summary}")
+
+@app.cli.command("top-searches")
+@click.option("--limit", default=POPULAR_TOP_N, show_default=True, help="Nombres a mostrar")
+@click.option("--hours", default=POPULAR_WINDOW_HOURS, show_default=True, help="Ventana de tiempo en horas")
+def top_searches_command(limit, hours):
+    """Muestra las flores más buscadas según el registro de búsquedas."""
+    if search_log is None:
+        raise click.ClickException("El registro de búsquedas está desactivado (SEARCH_LOG_ENABLED=0)")
+    for name, count in search_log.top(limit, hours):
+        click.echo(f"{count:>8}  {name}")
+
+def load_cache_snapshot(path=CACHE_SNAPSHOT_PATH):
+    """Carga la copia de la caché en memoria; devuelve las entradas cargadas"""
+    if not os.path.exists(path):
+        return 0
+    try:
+        return result_cache.load(path)
+    except (OSError, ValueError, KeyError) as e:
+        app.logger.error(f"No se pudo cargar la caché guardada: {str(e)}")
+        return 0
+
+@app.cli.command("init-db")
+def init_db_command():
+    """Crea las tablas de MySQL (ejecutar una vez por despliegue, no al arrancar)."""
+    init_db()
+    click.echo("Tablas creadas o ya existentes")
+
+
+APP_MODE = os.getenv('APP_MODE', 'development')
+# Prefijos de autocompletado que se precalculan antes de crear los workers
+PREWARM_SUGGESTION_PREFIX_LENGTH = int(os.getenv('PREWARM_SUGGESTION_PREFIX_LENGTH', 2))
+
+STARTUP_REPORT = {}
+_background_pid = None
+
+def prewarm():
+    """
+    Hace antes de crear los workers (gunicorn --preload) lo que si no pagaría
+    la primera petición de cada uno: importar requests, mysql.connector,
+    Flask-Bcrypt y unidecode, crear las sesiones HTTP, compilar las plantillas
+    y precalcular las sugerencias de los prefijos cortos. Todo queda compartido tras el fork.
+    No abre conexiones ni crea hilos. Devuelve los milisegundos por paso.
+    """
+    phases = {}
+
+    def phase(name, fn):
+        started = time.perf_counter()
+        fn()
+        phases[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    phase('lazy_imports', lambda: (requests.load(), mysql_connector.load(), unidecode.load(), get_bcrypt()))
+    phase('http_sessions', http_sessions.build_all)
+    phase('templates', lambda: [
+        app.jinja_env.get_template(name) for name in app.jinja_env.list_templates(extensions=['html'])
+    ])
+
+    def warm_tables():
+        names = catalog_names()
+        for name in names:
+            is_flower_related(name)
+        alphabet = sorted({char for name in names for char in name if char.isalpha()})
+        for length in range(1, PREWARM_SUGGESTION_PREFIX_LENGTH + 1):
+            for prefix in itertools.product(alphabet, repeat=length):
+                suggest_flowers(''.join(prefix), 8)
+
+    phase('matcher_and_suggestions', warm_tables)
+    return phases
+
+def _start_background_once():
+    """
+    Lanza en este proceso la precarga (si WARM_CACHE_ON_STARTUP) y el refresco
+    de populares si aún no se lanzaron (tras el fork en producción)
+    """
+    global _background_pid
+    if _background_pid == os.getpid():
+        return
+    _background_pid = os.getpid()
+    if WARM_CACHE_ON_STARTUP:
+        threading.Thread(target=_background_warmup, name='warm-cache', daemon=True).start()
+    if POPULAR_REFRESH_ENABLED and search_log is not None:
+        threading.Thread(target=_popularity_refresher, name='refresh-popular', daemon=True).start()
+
+def create_app(mode=None):
+    """
+    Prepara la app para servir: crea la caché compartida y la carpeta de
+    miniaturas (prepare_storage). mode='production' desactiva la depuración,
+    enlaza los recursos de build-assets y ejecuta prewarm() en el proceso
+    maestro; la precarga de caché (si WARM_CACHE_ON_STARTUP) y el refresco de
+    populares se lanzan en cada worker con su primera petición, nunca antes
+    del fork. Las tablas se crean aparte con flask init-db.
+    """
+    if STARTUP_REPORT:
+        return app
+
+    mode = mode or APP_MODE
+    started = time.perf_counter()
+    report = {'mode': mode, 'import_ms': round((started - STARTUP_STARTED) * 1000, 1)}
+    prepare_storage()
+
+    if mode == 'production':
+        app.debug = False
+        app.config['TEMPLATES_AUTO_RELOAD'] = False
+        report['prewarm_ms'] = prewarm()
+        app.before_request(_start_background_once)
+    else:
+        _start_background_once()
+
+    if mode == 'production':
+        report['asset_manifest_entries'] = load_asset_manifest()
+
+    snapshot_started = time.perf_counter()
+    report['snapshot_entries'] = load_cache_snapshot()
+    report['snapshot_ms'] = round((time.perf_counter() - snapshot_started) * 1000, 1)
+    report['total_ms'] = round((time.perf_counter() - STARTUP_STARTED) * 1000, 1)
+
+    STARTUP_REPORT.update(report)
+    app.logger.info(f"Arranque ({mode}) en {report['total_ms']} ms: {report}")
+    return app
+
+@app.cli.command("startup-report")
+@click.option("--mode", default="production", show_default=True, type=click.Choice(["production", "development"]))
+def startup_report_command(mode):
+    """Muestra cuánto tarda en arrancar la app y en qué se va el tiempo."""
+    create_app(mode)
+    click.echo(app.json.dumps(STARTUP_REPORT))
+
+if __name__ == '__main__':
+    create_app('development').run(debug=True, port=int(os.getenv("PORT", 5000)))
@@ -0,0 +1,59 @@
+"""
+Benchmark de logins por segundo según el factor de coste de bcrypt.
+
+Mide la verificación de contraseñas a través del pool dedicado de la app
+(HASH_WORKERS hilos) con varios clientes concurrentes.
+
+Uso (desde "flores mashup"):
+    python bench/bench_bcrypt.py --costs 4 8 10 12 --logins 40 --clients 8
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as bloomhub  # noqa: E402
+
+
+def run(cost, logins, clients):
+    stored = bloomhub.hash_password("contraseña-de-prueba", rounds=cost)
+
+    latencies = []
+
+    def login():
+        start = time.perf_counter()
+        ok = bloomhub.check_password(stored, "contraseña-de-prueba")
+        latencies.append(time.perf_counter() - start)
+        return ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(lambda _: login(), range(logins)))
+    elapsed = time.perf_counter() - start
+
+    assert all(results)
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return logins / elapsed, latencies[len(latencies) // 2], p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--costs", type=int, nargs="+", default=[4, 8, 10, 12])
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--clients", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"Pool bcrypt: {bloomhub.HASH_WORKERS} hilos, cola {bloomhub.HASH_QUEUE_LIMIT}; "
+          f"{args.clients} clientes, {args.logins} logins por coste")
+    print(f"{'coste':>5} {'logins/s':>10} {'p50 ms':>9} {'p95 ms':>9}")
+    for cost in args.costs:
+        throughput, p50, p95 = run(cost, args.logins, args.clients)
+        print(f"{cost:>5} {throughput:>10.1f} {p50 * 1000:>9.1f} {p95 * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
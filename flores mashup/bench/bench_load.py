@@ -0,0 +1,288 @@
+"""
+Prueba de carga de /login y /search sin red contra APIs y base de datos locales.
+
+Levanta servidores locales que imitan a Perenual, Pixabay, Unsplash y la API
+de Wikipedia (latencia, errores y 429 configurables por fuente), una base de
+datos SQLite que acepta las consultas MySQL de la app (o el MySQL de DB_* con
+--mysql) y la app Flask en un servidor con hilos. Después lanza peticiones
+con varios clientes concurrentes e informa del throughput y de p50/p95/p99.
+
+Uso (desde "flores mashup"):
+    python bench/bench_load.py --scenarios login search --requests 400 --concurrency 16
+    python bench/bench_load.py --latency unsplash=400 --errors pixabay=0.1 --rate-limited perenual=0.05
+    python bench/bench_load.py --no-cache --stream --json resultados.json
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import secrets
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from stubs import SOURCES, StubProfile, StubServer  # noqa: E402
+
+PASSWORD = "contraseña-de-prueba"
+
+DEFAULT_QUERIES = [
+    "rosa", "tulipán", "girasol", "orquídea", "lavanda", "margarita", "jazmín",
+    "lirio", "hortensia", "clavel", "dalia", "peonía", "amapola", "violeta",
+    # Rechazadas por is_flower_related (400) y erratas con sugerencias
+    "mesa", "computadora", "rossa", "girasoll"
+]
+
+
+def source_values(items, cast):
+    """Convierte ["perenual=120", "pixabay=80"] en {"perenual": 120.0, ...}"""
+    values = {}
+    for item in items or []:
+        source, _, value = item.partition("=")
+        if source not in SOURCES or not value:
+            raise argparse.ArgumentTypeError(f"Se esperaba <fuente>=<valor> con fuente en {SOURCES}: {item}")
+        values[source] = cast(value)
+    return values
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    position = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[position]
+
+
+class AppServer:
+    """La app Flask en un servidor werkzeug con hilos en un puerto local"""
+
+    def __init__(self, flask_app):
+        from werkzeug.serving import make_server
+        self._server = make_server("127.0.0.1", 0, flask_app, threaded=True)
+        self.base_url = f"http://127.0.0.1:{self._server.server_port}"
+        self._thread = threading.Thread(target=self._server.serve_forever, name="app", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+
+
+def seed_users(bloomhub, count):
+    """Crea (o reutiliza) los usuarios bench<N>@example.com con la misma contraseña"""
+    stored = bloomhub.hash_password(PASSWORD)
+    with bloomhub.db_cursor() as (conn, cur):
+        cur.executemany(
+            "INSERT IGNORE INTO usuarios (nombre, correo, contrasena) VALUES (%s, %s, %s)",
+            [(f"bench{i}", f"bench{i}@example.com", stored) for i in range(count)]
+        )
+        conn.commit()
+    return [f"bench{i}@example.com" for i in range(count)]
+
+
+def login(http, base_url, email):
+    """Devuelve (código, aceptado): /login redirige a la portada si las credenciales son válidas"""
+    response = http.post(f"{base_url}/login", data={"correo": email, "contrasena": PASSWORD},
+                         allow_redirects=False)
+    location = response.headers.get("Location", "")
+    return response.status_code, response.status_code == 302 and "/login" not in location
+
+
+def check_public_responses(base_url, email, query):
+    """
+    Con una sesión iniciada (permanente), las respuestas públicas cacheables
+    (/api/flowers, /img y /assets o /static) no deben llevar Set-Cookie ni Vary: Cookie.
+    Devuelve la lista de URLs que las llevan.
+    """
+    http = requests.Session()
+    login(http, base_url, email)
+    urls = [f"{base_url}/api/flowers/{query}"]
+    payload = http.post(f"{base_url}/search", data={"query": query}).json()
+    urls += [urljoin(base_url, url) for url in payload.get("thumbnails", [])[:1]]
+    page = http.get(f"{base_url}/").text
+    urls += [urljoin(base_url, url) for url in re.findall(r'="(/(?:assets|static)/[^"]+)"', page)[:1]]
+
+    leaks = []
+    for url in urls:
+        response = http.get(url, allow_redirects=False)
+        vary = response.headers.get("Vary", "").lower()
+        if "Set-Cookie" in response.headers or "cookie" in vary:
+            leaks.append(url.replace(base_url, ""))
+    return leaks
+
+
+def run_scenario(name, base_url, users, queries, requests_total, concurrency, stream):
+    """Lanza requests_total peticiones con `concurrency` clientes; devuelve el resumen"""
+    local = threading.local()
+    latencies = []
+    statuses = {}
+    failures = 0
+    lock = threading.Lock()
+
+    def client():
+        if getattr(local, "http", None) is None:
+            local.http = requests.Session()
+            local.email = users[threading.get_ident() % len(users)]
+            if name == "search":
+                login(local.http, base_url, local.email)
+        return local.http
+
+    def one(index):
+        nonlocal failures
+        http = client()
+        start = time.perf_counter()
+        if name == "login":
+            status, ok = login(http, base_url, users[index % len(users)])
+        else:
+            headers = {"Accept": "application/x-ndjson"} if stream else {}
+            response = http.post(f"{base_url}/search", data={"query": queries[index % len(queries)]},
+                                 headers=headers, allow_redirects=False)
+            response.content
+            status = response.status_code
+            ok = status in (200, 400, 404) and "json" in response.headers.get("Content-Type", "")
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] = statuses.get(status, 0) + 1
+            failures += not ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests_total)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "scenario": name,
+        "requests": requests_total,
+        "concurrency": concurrency,
+        "failures": failures,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "throughput": round(requests_total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenarios", nargs="+", choices=["login", "search"], default=["login", "search"])
+    parser.add_argument("--requests", type=int, default=200, help="peticiones por escenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=20, help="peticiones previas sin medir por escenario")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--queries", nargs="+", default=DEFAULT_QUERIES)
+    parser.add_argument("--latency", nargs="*", metavar="FUENTE=MS", help="latencia media de cada API simulada (por defecto 50 ms)")
+    parser.add_argument("--errors", nargs="*", metavar="FUENTE=P", help="proporción de respuestas 500")
+    parser.add_argument("--rate-limited", nargs="*", metavar="FUENTE=P", help="proporción de respuestas 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="segundos de Retry-After en los 429")
+    parser.add_argument("--no-cache", action="store_true", help="desactiva la caché de resultados para medir siempre las APIs")
+    parser.add_argument("--stream", action="store_true", help="pide /search en modo NDJSON")
+    parser.add_argument("--bcrypt-cost", type=int, help="BCRYPT_LOG_ROUNDS durante la prueba (por defecto el de la app)")
+    parser.add_argument("--mysql", action="store_true", help="usa el MySQL de DB_* en lugar de SQLite")
+    parser.add_argument("--seed", type=int, default=1, help="semilla de los perfiles de error y latencia")
+    parser.add_argument("--json", metavar="ARCHIVO", help="guarda los resultados en JSON para comparar entre versiones")
+    parser.add_argument("--verbose", action="store_true", help="muestra el log de peticiones y los errores de la app")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bloomhub-bench-")
+    # Nada de red, precargas ni cuotas: se mide la app, no los límites de los planes gratuitos
+    os.environ["CACHE_SNAPSHOT_PATH"] = os.path.join(workdir, "cache_snapshot.json")
+    os.environ["SHARED_CACHE_PATH"] = os.path.join(workdir, "shared_cache.sqlite3")
+    os.environ["IMAGE_CACHE_DIR"] = os.path.join(workdir, "image_cache")
+    # El proxy de miniaturas exige una SECRET_KEY propia y solo descarga de los hosts permitidos
+    os.environ.setdefault("SECRET_KEY", secrets.token_hex(16))
+    os.environ["IMAGE_ALLOWED_HOSTS"] = "127.0.0.1"
+    if args.no_cache:
+        os.environ["SHARED_CACHE_ENABLED"] = "0"
+    os.environ["WARM_CACHE_ON_STARTUP"] = "0"
+    for source in SOURCES:
+        os.environ[f"{source.upper()}_QUOTA_HOURLY"] = "0"
+        os.environ[f"{source.upper()}_QUOTA_DAILY"] = "0"
+    if args.bcrypt_cost:
+        os.environ["BCRYPT_LOG_ROUNDS"] = str(args.bcrypt_cost)
+
+    import app as bloomhub
+
+    if not args.verbose:
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        bloomhub.app.logger.setLevel(logging.CRITICAL)
+
+    latency = source_values(args.latency, float)
+    errors = source_values(args.errors, float)
+    rate_limited = source_values(args.rate_limited, float)
+    profiles = {
+        source: StubProfile(latency.get(source, 50.0), errors.get(source, 0.0),
+                            rate_limited.get(source, 0.0), args.retry_after)
+        for source in SOURCES
+    }
+    stubs = StubServer(profiles, seed=args.seed).start()
+    for source in SOURCES:
+        bloomhub.APIS[source]["url"] = stubs.url(source)
+
+    if args.mysql:
+        bloomhub.init_db()
+        store = f"MySQL {bloomhub.DB_CONFIG['host']}:{bloomhub.DB_CONFIG['port']}"
+    else:
+        from sqlite_store import SQLiteStore
+        sqlite = SQLiteStore(os.path.join(workdir, "bloomhub.sqlite3"))
+        bloomhub.db_pool._connect = sqlite.connect
+        bloomhub.species_pool._connect = sqlite.connect
+        store = "SQLite"
+
+    if args.no_cache:
+        bloomhub.result_cache.ttls = {source: 0 for source in SOURCES}
+        bloomhub.result_cache.negative_ttl = 0
+
+    bloomhub.create_app("production")
+    users = seed_users(bloomhub, args.users)
+    server = AppServer(bloomhub.app).start()
+
+    print(f"App en {server.base_url}, APIs simuladas en {stubs.base_url}, base de datos {store}")
+    print("Perfiles: " + ", ".join(
+        f"{source} {p.latency_ms:.0f} ms/{p.error_rate:.0%} 500/{p.rate_limited:.0%} 429"
+        for source, p in profiles.items()
+    ))
+    print(f"bcrypt coste {bloomhub.app.config['BCRYPT_LOG_ROUNDS']}, caché {'desactivada' if args.no_cache else 'activada'}")
+    print(f"{'escenario':>9} {'peticiones':>10} {'fallos':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  códigos")
+
+    results = []
+    for name in args.scenarios:
+        if args.warmup:
+            run_scenario(name, server.base_url, users, args.queries, args.warmup, args.concurrency, args.stream)
+        result = run_scenario(name, server.base_url, users, args.queries,
+                              args.requests, args.concurrency, args.stream)
+        results.append(result)
+        print(f"{name:>9} {result['requests']:>10} {result['failures']:>6} {result['throughput']:>8.1f} "
+              f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f}  "
+              + " ".join(f"{code}x{count}" for code, count in result["statuses"].items()))
+
+    leaks = check_public_responses(server.base_url, users[0], args.queries[0])
+    print("Respuestas públicas sin Set-Cookie ni Vary: Cookie" if not leaks
+          else f"Respuestas públicas con Set-Cookie o Vary: Cookie: {', '.join(leaks)}")
+
+    print(f"Llamadas a las APIs simuladas: {stubs.requests}; caché: {bloomhub.result_cache.stats()}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"profiles": {s: vars(p) for s, p in profiles.items()}, "results": results}, f, indent=2)
+
+    server.stop()
+    stubs.stop()
+    failed = sum(result["failures"] for result in results) + len(leaks)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
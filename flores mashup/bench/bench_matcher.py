@@ -0,0 +1,130 @@
+"""
+Micro-benchmark y comprobación de equivalencia de is_flower_related.
+
+Compara el matcher precompilado de la app con la implementación anterior
+(palabra clave por palabra clave, un re.search por patrón y unidecode sobre
+todo el texto) sobre un corpus de nombres, variantes y resúmenes largos.
+Termina con error si alguna respuesta o normalización difiere.
+
+Uso (desde "flores mashup"):
+    python bench/bench_matcher.py --repeat 200
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as bloomhub  # noqa: E402
+from unidecode import unidecode  # noqa: E402
+
+
+def legacy_normalize_flower_name(name):
+    """Normalización original con unidecode, conservada como referencia"""
+    if not name:
+        return None
+
+    normalized = unidecode(name.lower().strip())
+
+    if normalized.endswith('es'):
+        normalized = normalized[:-2]
+    elif normalized.endswith('s'):
+        normalized = normalized[:-1]
+
+    return bloomhub.FLOWER_SYNONYMS.get(normalized, normalized)
+
+
+def legacy_is_flower_related(text):
+    """Implementación original, conservada como referencia"""
+    if not text:
+        return False
+
+    normalized = legacy_normalize_flower_name(text)
+
+    if any(
+        keyword == normalized or
+        normalized in keyword or
+        keyword in normalized
+        for keyword in bloomhub.FLOWER_KEYWORDS
+    ):
+        return True
+
+    patterns = [
+        r'jazm[ií]n', r'jasmine', r'rose', r'rosa',
+        r'orqu[ií]dea', r'orchid', r'tulip', r'tulip[aá]n',
+        r'flor', r'flower', r'blossom', r'bloom',
+        r'girasol', r'sunflower', r'dalia', r'hibisco',
+        r'peon[ií]a', r'azucena', r'alcatraz', r'cala'
+    ]
+
+    return any(re.search(pattern, normalized) for pattern in patterns)
+
+
+LONG_SUMMARY = (
+    "El Helianthus annuus es una planta herbácea anual de la familia de las "
+    "asteráceas, originaria de Centro y Norteamérica y cultivada como "
+    "oleaginosa y ornamental en todo el mundo.\n\n"
+) * 12
+
+NON_FLOWER = [
+    "auto", "casa", "perro", "gato", "computadora", "libro", "telefono",
+    "mesa", "zanahoria", "montaña", "xyz", "es", "s", "a", "", "  ",
+    "Ñandú", "北京", "Straße", "crème brûlée",
+    "La computadora portátil tiene un procesador de varios núcleos.\n" * 20
+]
+
+
+def build_corpus():
+    corpus = set(NON_FLOWER)
+    corpus.update(bloomhub.FLOWER_KEYWORDS)
+    corpus.update(bloomhub.FLOWER_SYNONYMS)
+    corpus.update(bloomhub.FLOWER_SYNONYMS.values())
+    corpus.update(bloomhub.SCIENTIFIC_NAMES.values())
+    for keyword in bloomhub.FLOWER_KEYWORDS:
+        corpus.add(keyword.upper())
+        corpus.add(keyword + "s")
+        corpus.add(keyword[:3])
+        corpus.add(keyword[1:-1])
+        corpus.add(f"mi {keyword} favorita")
+    corpus.add(LONG_SUMMARY)
+    corpus.add(LONG_SUMMARY.replace("planta", "Rosa canina"))
+    return sorted(corpus)
+
+
+def check_equivalence(corpus):
+    mismatches = [
+        text for text in corpus
+        if legacy_is_flower_related(text) != bloomhub.is_flower_related(text) or
+        legacy_normalize_flower_name(text) != bloomhub.normalize_flower_name(text)
+    ]
+    for text in mismatches[:10]:
+        print(f"DIFERENCIA: {text[:60]!r}")
+    return not mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    corpus = build_corpus()
+    if not check_equivalence(corpus):
+        sys.exit(1)
+    print(f"Equivalencia OK sobre {len(corpus)} textos")
+
+    cases = {
+        "consulta corta": ["girasol", "perro", "orqidea", "tulipanes"],
+        "resumen largo": [LONG_SUMMARY],
+    }
+    for label, texts in cases.items():
+        for name, fn in (("anterior", legacy_is_flower_related),
+                         ("precompilado", bloomhub.is_flower_related)):
+            seconds = timeit.timeit(lambda: [fn(t) for t in texts], number=args.repeat)
+            per_call = seconds / (args.repeat * len(texts)) * 1e6
+            print(f"{label:>15} {name:>13}: {per_call:9.1f} µs/llamada")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Tamaño y tiempo de serialización de la respuesta de /search.
+
+Compara el payload completo (fields=full) con el perfil compacto por defecto
+y el serializador JSON estándar de Flask con el basado en orjson, sobre una
+respuesta típica con datos de Perenual, Wikipedia e imágenes.
+
+Uso (desde "flores mashup"):
+    python bench/bench_payload.py --repeat 20000
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as bloomhub  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+
+def sample_payload():
+    plant = bloomhub.perenual_plant_fields({
+        "common_name": "European rose",
+        "scientific_name": ["Rosa gallica"],
+        "cycle": "Perennial",
+        "watering": "Average",
+        "sunlight": ["full sun", "part shade"],
+        "care_level": "Medium",
+        "growth_rate": "High",
+        "hardiness": {"min": "5", "max": "9"},
+        "flowers": True,
+        "foliage": "Deciduous",
+        "description": "Arbusto de flores perfumadas muy cultivado en jardines. " * 4
+    })
+    extract = "La rosa es la flor de los rosales, arbustos del género Rosa de la familia Rosaceae. " * 12
+    wikipedia = {
+        "title": "Rosa",
+        "summary": extract[:500] + "...",
+        "url": "https://es.wikipedia.org/wiki/Rosa",
+        "extract": extract[:1000]
+    }
+    images = [f"https://cdn.pixabay.com/photo/2020/05/0{i}/rose-{i}_640.jpg" for i in range(3)] + \
+             [f"https://images.unsplash.com/photo-15{i}?w=1080&q=80" for i in range(3)]
+    return {
+        "plant_info": bloomhub.enhance_plant_data(plant, wikipedia, "rosa"),
+        "images": images,
+        "wikipedia": wikipedia,
+        "query": "rosa",
+        "normalized_query": "rosa",
+        "sources": {"perenual": True, "pixabay": True, "unsplash": True, "wikipedia": True}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+
+    payload = sample_payload()
+    profiles = {name: bloomhub.select_fields(payload, fields) for name, fields in bloomhub.SEARCH_PROFILES.items()}
+    encoders = {"stdlib": DefaultJSONProvider(bloomhub.app)}
+    if bloomhub.orjson is not None:
+        encoders["orjson"] = bloomhub.FastJSONProvider(bloomhub.app)
+
+    print(f"{'perfil':>8} {'codificador':>11} {'bytes':>7} {'µs/respuesta':>13}")
+    with bloomhub.app.app_context():
+        for profile, data in profiles.items():
+            for name, encoder in encoders.items():
+                size = len(encoder.response(data).get_data())
+                seconds = timeit.timeit(lambda: encoder.response(data).get_data(), number=args.repeat)
+                print(f"{profile:>8} {name:>11} {size:>7} {seconds / args.repeat * 1e6:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Almacén local compatible con la parte de mysql.connector que usa la app.
+
+Traduce a SQLite las sentencias de app.py (placeholders %s, INSERT IGNORE,
+ON DUPLICATE KEY UPDATE y la búsqueda FULLTEXT de la tabla especies) para
+poder ejecutar los benchmarks sin un servidor MySQL. Solo se usa desde bench/.
+"""
+import re
+import sqlite3
+
+import mysql.connector
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usuarios (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre TEXT NOT NULL,
+    correo TEXT NOT NULL UNIQUE,
+    contrasena TEXT NOT NULL,
+    creado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS especies (
+    id INTEGER PRIMARY KEY,
+    common_name TEXT,
+    scientific_name TEXT,
+    datos TEXT NOT NULL,
+    actualizado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS busquedas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    consulta TEXT NOT NULL,
+    consulta_normalizada TEXT NOT NULL,
+    fuentes TEXT,
+    codigo INTEGER NOT NULL,
+    modo TEXT NOT NULL,
+    latencia_ms INTEGER NOT NULL,
+    creado_en TIMESTAMP NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_busquedas_creado ON busquedas (creado_en, consulta_normalizada);
+"""
+
+_FULLTEXT = re.compile(
+    r"MATCH\s*\(([^)]*)\)\s*AGAINST\s*\(\s*%s\s+IN\s+NATURAL\s+LANGUAGE\s+MODE\s*\)",
+    re.IGNORECASE
+)
+_ON_DUPLICATE = re.compile(r"\s+ON\s+DUPLICATE\s+KEY\s+UPDATE\s+.*$", re.IGNORECASE | re.DOTALL)
+
+
+def translate(sql):
+    """Reescribe una sentencia MySQL de la app en su equivalente SQLite"""
+    def fulltext(match):
+        columns = " || ' ' || ".join(
+            f"coalesce({column.strip()}, '')" for column in match.group(1).split(",")
+        )
+        return f"instr(lower({columns}), lower(%s)) > 0"
+
+    sql = _FULLTEXT.sub(fulltext, sql)
+    if _ON_DUPLICATE.search(sql):
+        sql = _ON_DUPLICATE.sub("", sql)
+        sql = re.sub(r"^\s*INSERT\s+INTO", "INSERT OR REPLACE INTO", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"^\s*INSERT\s+IGNORE\s+INTO", "INSERT OR IGNORE INTO", sql, flags=re.IGNORECASE)
+    return sql.replace("%s", "?")
+
+
+class SQLiteCursor:
+    def __init__(self, conn, dictionary):
+        self._cursor = conn.cursor()
+        self._dictionary = dictionary
+
+    def execute(self, sql, params=()):
+        try:
+            self._cursor.execute(translate(sql), tuple(params or ()))
+        except sqlite3.IntegrityError as e:
+            raise mysql.connector.IntegrityError(msg=str(e)) from e
+        except sqlite3.Error as e:
+            raise mysql.connector.DatabaseError(msg=str(e)) from e
+
+    def executemany(self, sql, rows):
+        try:
+            self._cursor.executemany(translate(sql), [tuple(row) for row in rows])
+        except sqlite3.IntegrityError as e:
+            raise mysql.connector.IntegrityError(msg=str(e)) from e
+        except sqlite3.Error as e:
+            raise mysql.connector.DatabaseError(msg=str(e)) from e
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._closed = False
+
+    def cursor(self, dictionary=False):
+        return SQLiteCursor(self._conn, dictionary)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def is_connected(self):
+        return not self._closed
+
+    def close(self):
+        self._closed = True
+        self._conn.close()
+
+
+class SQLiteStore:
+    """Base de datos SQLite en disco; connect() sustituye a mysql.connector.connect"""
+
+    def __init__(self, path):
+        self.path = path
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        conn.commit()
+        conn.close()
+
+    def connect(self):
+        return SQLiteConnection(self.path)
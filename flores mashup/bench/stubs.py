@@ -0,0 +1,181 @@
+"""
+Servidores locales que imitan a Perenual, Pixabay, Unsplash y la API de
+Wikipedia para los benchmarks sin red.
+
+Cada fuente tiene un perfil con latencia media, proporción de errores 500 y
+proporción de respuestas 429 (con Retry-After). Las rutas son
+/<fuente>/... y responden con el mismo formato JSON que las APIs reales. Las
+URLs de imágenes que devuelven apuntan a /images/..., que sirve un GIF de 1x1
+(o un 404 si el nombre empieza por "rota") para el proxy de miniaturas.
+"""
+import base64
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+SOURCES = ('perenual', 'pixabay', 'unsplash', 'wikipedia')
+
+PIXEL_GIF = base64.b64decode('R0lGODlhAQABAIAAAP///wAAACH5BAEAAAAALAAAAAABAAEAAAICRAEAOw==')
+
+
+class StubProfile:
+    """Comportamiento de una fuente simulada"""
+
+    def __init__(self, latency_ms=50.0, error_rate=0.0, rate_limited=0.0, retry_after=1):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.rate_limited = rate_limited
+        self.retry_after = retry_after
+
+
+def perenual_payload(params, base_url):
+    query = params.get('q', [''])[0]
+    return {'data': [{
+        'id': zlib.crc32(query.encode('utf-8')) % 100000,
+        'common_name': query,
+        'scientific_name': [f'{query.capitalize()} stubensis'],
+        'cycle': 'Perennial',
+        'watering': 'Average',
+        'sunlight': ['full sun', 'part shade'],
+        'care_level': 'Medium',
+        'description': f'Planta con flor de prueba para {query}.'
+    }]}
+
+
+def pixabay_payload(params, base_url):
+    query = params.get('q', [''])[0].replace(' ', '-')
+    return {'hits': [{'webformatURL': f'{base_url}/images/pixabay/{query}-{i}.gif'} for i in range(3)]}
+
+
+def unsplash_payload(params, base_url):
+    query = params.get('query', [''])[0].replace(' ', '-')
+    return {'results': [{'urls': {'regular': f'{base_url}/images/unsplash/{query}-{i}.gif'}} for i in range(3)]}
+
+
+def wikipedia_payload(params, base_url):
+    titles = params.get('titles', [''])[0].split('|')
+    pages = []
+    found = False
+    for title in titles:
+        # Solo existe la primera página sin "(flor)", como suele pasar en es.wikipedia
+        if found or title.endswith('(flor)'):
+            pages.append({'title': title, 'missing': True})
+            continue
+        found = True
+        extract = f'{title} es una planta con flor de la familia de prueba. ' * 10
+        if 'exintro' not in params:
+            extract += '\n\n\n== Descripción ==\n' + 'Hojas alternas y flores solitarias. ' * 10
+        pages.append({
+            'title': title,
+            'fullurl': f'http://stub.invalid/wiki/{title.replace(" ", "_")}',
+            'extract': extract
+        })
+    return {'batchcomplete': True, 'query': {'pages': pages}}
+
+
+PAYLOADS = {
+    'perenual': perenual_payload,
+    'pixabay': pixabay_payload,
+    'unsplash': unsplash_payload,
+    'wikipedia': wikipedia_payload
+}
+
+
+class StubServer:
+    """Servidor HTTP con hilos que atiende las cuatro fuentes en un puerto local"""
+
+    def __init__(self, profiles, seed=None, host='127.0.0.1', port=0):
+        self.profiles = profiles
+        self.requests = {source: 0 for source in SOURCES + ('images',)}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def url(self, source):
+        return f'{self.base_url}/{source}'
+
+    def _decide(self, profile):
+        with self._lock:
+            roll = self._random.random()
+            delay = profile.latency_ms * self._random.uniform(0.5, 1.5) / 1000.0
+        if roll < profile.rate_limited:
+            return 'rate_limited', delay
+        if roll < profile.rate_limited + profile.error_rate:
+            return 'error', delay
+        return 'ok', delay
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                source = parts.path.strip('/').split('/')[0]
+                if source == 'images':
+                    self._send_image(parts.path)
+                    return
+                profile = stub.profiles.get(source)
+                if profile is None:
+                    self._send(404, {'error': 'ruta desconocida'})
+                    return
+                with stub._lock:
+                    stub.requests[source] += 1
+
+                outcome, delay = stub._decide(profile)
+                time.sleep(delay)
+                if outcome == 'rate_limited':
+                    self._send(429, {'message': 'Too Many Requests'},
+                               {'Retry-After': str(profile.retry_after), 'X-RateLimit-Remaining': '0'})
+                elif outcome == 'error':
+                    self._send(500, {'message': 'Internal Server Error'})
+                else:
+                    self._send(200, PAYLOADS[source](parse_qs(parts.query), stub.base_url))
+
+            def _send_image(self, path):
+                with stub._lock:
+                    stub.requests['images'] += 1
+                if path.rsplit('/', 1)[-1].startswith('rota'):
+                    self._send(404, {'message': 'Not Found'})
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/gif')
+                self.send_header('Content-Length', str(len(PIXEL_GIF)))
+                self.end_headers()
+                self.wfile.write(PIXEL_GIF)
+
+            def _send(self, status, payload, headers=None):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='stubs', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,624 @@
+const popularFlowers = [
+  'rosas', 'tulipanes', 'girasoles', 'orquídeas', 'margaritas',
+  'lirios', 'claveles', 'hortensias', 'jazmines', 'lavanda',
+  'amapolas', 'peonías', 'dalias', 'crisantemos', 'narcisos',
+  'alcatraz', 'cala', 'lirio de agua'
+];
+
+
+const nonFlowerTerms = ['auto', 'casa', 'perro', 'gato', 'computadora', 'libro', 'telefono'];
+
+
+const floristsData = [
+  {
+    id: 1,
+    name: "Florería Jardín",
+    lat: 28.635841,
+    lng: -106.076194,
+    address: "Calle 5a #302, Centro",
+    phone: "614 123 4567",
+    flowers: ["roses", "lilies", "peonies", "orchids"],
+    schedule: "L-V 9:00-18:00, S 10:00-15:00",
+    description: "Especialistas en arreglos florales para ocasiones especiales con más de 15 años de experiencia."
+  },
+  {
+    id: 2,
+    name: "Flores del Desierto",
+    lat: 28.627500,
+    lng: -106.070000,
+    address: "Av. Universidad #3302",
+    phone: "614 987 6543",
+    flowers: ["roses", "tulips", "sunflowers"],
+    schedule: "L-S 8:00-20:00",
+    description: "Amplia variedad de flores de temporada y plantas de ornato."
+  },
+  {
+    id: 3,
+    name: "Rosas y Más",
+    lat: 28.642000,
+    lng: -106.065000,
+    address: "C. 24a #1601",
+    phone: "614 555 1234",
+    flowers: ["roses", "lilies", "orchids"],
+    schedule: "L-D 10:00-19:00",
+    description: "Especialistas en rosas de importación y arreglos elegantes."
+  },
+  {
+    id: 4,
+    name: "Tulipanes Chihuahua",
+    lat: 28.630000,
+    lng: -106.072000,
+    address: "Av. Tecnológico #2500",
+    phone: "614 777 8888",
+    flowers: ["tulips", "sunflowers", "peonies"],
+    schedule: "M-S 9:00-17:00",
+    description: "La mejor selección de tulipanes importados de Holanda."
+  },
+  {
+    id: 5,
+    name: "Orquídeas Exóticas",
+    lat: 28.625000,
+    lng: -106.080000,
+    address: "Blvd. Díaz Ordaz #1500",
+    phone: "614 222 3333",
+    flowers: ["orchids", "anthuriums", "bromeliads"],
+    schedule: "L-V 10:00-19:00, S 10:00-14:00",
+    description: "Especialistas en orquídeas y plantas exóticas."
+  }
+];
+
+
+function initFloristMap() {
+  const map = L.map('florist-map').setView([28.632995, -106.069100], 14);
+
+
+  L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+    attribution: '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> colaboradores'
+  }).addTo(map);
+
+
+  const markersLayer = L.layerGroup().addTo(map);
+
+
+  const flowerIcon = L.divIcon({
+    className: 'flower-icon-map',
+    html: '🌷',
+    iconSize: [30, 30]
+  });
+
+
+  function updateMarkers(filter = 'all') {
+    markersLayer.clearLayers();
+
+    const filteredFlorists = floristsData.filter(florist => {
+      return filter === 'all' || florist.flowers.includes(filter);
+    });
+
+    filteredFlorists.forEach(florist => {
+      const marker = L.marker([florist.lat, florist.lng], { icon: flowerIcon })
+        .addTo(markersLayer)
+        .bindPopup(`
+          <h4 class="text-rose">${florist.name}</h4>
+          <p><strong>Dirección:</strong> ${florist.address}</p>
+          <p><strong>Teléfono:</strong> ${florist.phone}</p>
+          <p><strong>Horario:</strong> ${florist.schedule}</p>
+          <p><strong>Especialidades:</strong> ${getFlowerNames(florist.flowers).join(', ')}</p>
+          <p>${florist.description}</p>
+          <button onclick="alert('Contactando a ${florist.name}...\\nTeléfono: ${florist.phone}')" 
+                  style="width: 100%; padding: 5px; background: #e91e63; color: white; border: none; border-radius: 5px; cursor: pointer;">
+            Llamar ahora
+          </button>
+        `);
+    });
+  }
+
+
+  function getFlowerNames(flowerTypes) {
+    const flowerNames = {
+      'roses': 'Rosas',
+      'tulips': 'Tulipanes',
+      'lilies': 'Lirios',
+      'orchids': 'Orquídeas',
+      'peonies': 'Peonías',
+      'sunflowers': 'Girasoles',
+      'anthuriums': 'Anturios',
+      'bromeliads': 'Bromelias'
+    };
+
+    return flowerTypes.map(type => flowerNames[type] || type);
+  }
+
+
+  updateMarkers();
+
+
+  document.querySelectorAll('.map-filter').forEach(filter => {
+    filter.addEventListener('click', function() {
+      document.querySelectorAll('.map-filter').forEach(f => f.classList.remove('active'));
+      this.classList.add('active');
+      updateMarkers(this.dataset.filter);
+    });
+  });
+}
+
+
+function showInitialSuggestions() {
+  const container = document.getElementById('suggestions');
+  container.innerHTML = '';
+
+  popularFlowers.forEach(flower => {
+    const chip = document.createElement('span');
+    chip.className = 'suggestion-chip';
+    chip.textContent = flower;
+    chip.onclick = () => {
+      document.getElementById('flower-search').value = flower;
+      searchFlower();
+    };
+    container.appendChild(chip);
+  });
+}
+
+
+async function searchFlower() {
+  const query = document.getElementById('flower-search').value.trim();
+  const loadingElement = document.getElementById('loading');
+  const resultsElement = document.getElementById('results');
+  const errorElement = document.getElementById('error');
+
+
+  if (query.length === 0) {
+    showError('⚠️ Por favor ingresa el nombre de una flor', popularFlowers.slice(0, 6));
+    return;
+  }
+
+  if (nonFlowerTerms.some(term => term.toLowerCase() === query.toLowerCase())) {
+    showError(`"${query}" no parece ser una flor. Intenta con:`, popularFlowers);
+    return;
+  }
+
+
+  resetUI();
+  loadingElement.style.display = 'block';
+
+  try {
+
+    if (query.toLowerCase() === 'alcatraz') {
+      displayResults({
+        query: "alcatraz",
+        plant_info: {
+          name: "Alcatraz (Cala)",
+          scientific_name: "Zantedeschia aethiopica",
+          cycle: "Perenne",
+          care: {
+            watering: "Abundante durante crecimiento, reducir en invierno",
+            sunlight: "Luz filtrada o semisombra",
+            temperature: "No inferior a 10°C",
+            care_level: "Moderado",
+            tips: "Evitar agua estancada en el rizoma para prevenir podredumbre"
+          },
+          description: "Flor elegante en forma de embudo, popular en arreglos florales. Sus hojas son grandes y brillantes."
+        },
+        images: [
+          "https://cdn.pixabay.com/photo/2017/07/25/20/20/calla-lily-2539604_640.jpg",
+          "https://cdn.pixabay.com/photo/2016/07/12/18/54/calla-lily-1512822_640.jpg"
+        ],
+        wikipedia: {
+          summary: "El alcatraz es una planta herbácea perenne de la familia Araceae, nativa del sur de África. Es muy apreciada por sus flores elegantes y su follaje ornamental.",
+          url: "https://es.wikipedia.org/wiki/Zantedeschia_aethiopica"
+        },
+        sources: {
+          perenual: true,
+          pixabay: true,
+          wikipedia: true
+        }
+      });
+      return;
+    }
+
+
+    const response = await fetch('/search', {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/x-www-form-urlencoded',
+        'Accept': 'application/x-ndjson, application/json'
+      },
+      body: `query=${encodeURIComponent(query)}`
+    });
+
+    let data;
+    if ((response.headers.get('Content-Type') || '').includes('application/x-ndjson')) {
+      // Resultados progresivos: se pinta cada fuente en cuanto llega
+      const partial = { query: query, images: [], thumbnails: [], sources: {} };
+      await readSearchStream(response, frame => {
+        if (frame.type === 'source') {
+          if (frame.status === true) loadingElement.style.display = 'none';
+          renderPartialResults(partial, frame);
+        } else {
+          data = frame;
+        }
+      });
+      if (!data) {
+        throw { message: 'La búsqueda se interrumpió, intenta de nuevo' };
+      }
+    } else {
+      data = await response.json();
+    }
+
+    if (!response.ok || data.error) {
+      throw {
+        message: data.error || 'Error en la búsqueda',
+        suggestions: data.suggestions || []
+      };
+    }
+
+    displayResults(data);
+  } catch (error) {
+    document.getElementById('results').style.display = 'none';
+    showError(error.message, error.suggestions || []);
+  } finally {
+    loadingElement.style.display = 'none';
+  }
+}
+
+
+async function readSearchStream(response, onFrame) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { done, value } = await reader.read();
+    buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+    let newline;
+    while ((newline = buffer.indexOf('\n')) >= 0) {
+      const line = buffer.slice(0, newline).trim();
+      buffer = buffer.slice(newline + 1);
+      if (line) onFrame(JSON.parse(line));
+    }
+    if (done) break;
+  }
+  if (buffer.trim()) onFrame(JSON.parse(buffer));
+}
+
+
+function renderPartialResults(partial, frame) {
+  partial.sources[frame.source] = frame.status;
+  if (frame.status !== true) return;
+
+  if (frame.source === 'pixabay' || frame.source === 'unsplash') {
+    partial.images = partial.images.concat(frame.data).slice(0, 6);
+    partial.thumbnails = partial.thumbnails.concat(frame.thumbnails || frame.data).slice(0, 6);
+  } else if (frame.source === 'wikipedia') {
+    partial.wikipedia = frame.data;
+  } else if (frame.source === 'perenual') {
+    partial.plant_info = frame.data;
+  }
+  displayResults(partial);
+}
+
+
+function displayResults(data) {
+  const resultsElement = document.getElementById('results');
+  const imageGallery = document.getElementById('image-gallery');
+  const noImagesElement = document.getElementById('no-images');
+
+
+  const displayName = data.plant_info?.name || 
+                    data.query.charAt(0).toUpperCase() + data.query.slice(1);
+  document.getElementById('result-title').textContent = displayName;
+
+
+  imageGallery.innerHTML = '';
+  if (data.images && data.images.length > 0) {
+    // La galería usa las miniaturas de /img; el modal abre la imagen original
+    const thumbnails = data.thumbnails || [];
+    data.images.forEach((imgUrl, index) => {
+      const col = document.createElement('div');
+      col.className = 'col-md-4 col-6 mb-3';
+      col.innerHTML = `
+        <img src="${thumbnails[index] || imgUrl}" class="img-fluid flower-img" 
+             alt="${displayName}" loading="lazy"
+             onerror="this.parentElement.remove()"
+             onclick="showImageModal('${imgUrl}', '${displayName}')">
+      `;
+      imageGallery.appendChild(col);
+    });
+    noImagesElement.style.display = 'none';
+  } else {
+    noImagesElement.style.display = 'block';
+  }
+
+
+  const plantInfoElement = document.getElementById('plant-info');
+  const wikipediaInfoElement = document.getElementById('wikipedia-info');
+
+  if (data.plant_info) {
+    let html = '';
+    if (data.plant_info.scientific_name) {
+      html += `
+        <div class="mb-3">
+          <strong>Nombre científico:</strong> 
+          <span class="scientific-name">${data.plant_info.scientific_name}</span>
+        </div>`;
+    }
+    if (data.plant_info.cycle) {
+      html += `<div class="mb-3"><strong>Ciclo de vida:</strong> ${data.plant_info.cycle}</div>`;
+    }
+    if (data.plant_info.description) {
+      html += `<div class="mt-3">${data.plant_info.description}</div>`;
+    }
+    plantInfoElement.innerHTML = html || '<p>No hay información adicional disponible</p>';
+  } else {
+    plantInfoElement.innerHTML = '<p>No se encontró información detallada</p>';
+  }
+
+
+  if (data.wikipedia) {
+    let wikiHtml = '';
+    // El resumen ya viene dentro de plant_info.description en la respuesta final
+    if (data.wikipedia.summary || data.wikipedia.url) {
+      wikiHtml += `
+        <div class="wikipedia-card p-3 rounded">
+          <h5 class="d-flex align-items-center">
+            <i class="bi bi-wikipedia me-2"></i>Wikipedia
+          </h5>
+          ${data.wikipedia.summary ? `<p>${data.wikipedia.summary}</p>` : ''}`;
+      if (data.wikipedia.url) {
+        wikiHtml += `
+          <a href="${data.wikipedia.url}" target="_blank" 
+             class="btn btn-sm btn-outline-pink mt-2">
+              Leer más en Wikipedia
+          </a>`;
+      }
+      wikiHtml += `</div>`;
+    }
+    wikipediaInfoElement.innerHTML = wikiHtml;
+  } else {
+    wikipediaInfoElement.innerHTML = '';
+  }
+
+
+  const plantCareElement = document.getElementById('plant-care');
+  plantCareElement.innerHTML = ''; 
+
+  if (data.plant_info?.care) {
+
+    const careTemplate = `
+      <div class="care-item d-flex align-items-start">
+        <span class="care-icon"><i class="bi bi-droplet"></i></span>
+        <div>
+          <strong>Riego:</strong> ${data.plant_info.care.watering}
+        </div>
+      </div>
+      <div class="care-item d-flex align-items-start">
+        <span class="care-icon"><i class="bi bi-brightness-high"></i></span>
+        <div>
+          <strong>Luz solar:</strong> ${data.plant_info.care.sunlight}
+        </div>
+      </div>
+      <div class="care-item d-flex align-items-start">
+        <span class="care-icon"><i class="bi bi-thermometer-half"></i></span>
+        <div>
+          <strong>Temperatura ideal:</strong> ${data.plant_info.care.temperature || '15-25°C'}
+        </div>
+      </div>
+      <div class="care-item d-flex align-items-start">
+        <span class="care-icon"><i class="bi bi-heart"></i></span>
+        <div>
+          <strong>Nivel de cuidado:</strong> ${data.plant_info.care.care_level}
+        </div>
+      </div>
+      ${data.plant_info.care.tips ? `
+        <div class="alert alert-info mt-3">
+          <i class="bi bi-lightbulb"></i> <strong>Consejo:</strong> ${data.plant_info.care.tips}
+        </div>
+      ` : ''}
+    `;
+
+    plantCareElement.innerHTML = careTemplate;
+  } else if (data.plant_info) {
+
+    plantCareElement.innerHTML = `
+      <div class="alert alert-warning">
+        <i class="bi bi-exclamation-triangle"></i> Información de cuidados limitada
+      </div>
+      ${data.plant_info.watering ? `
+        <div class="care-item">
+          <strong>Riego:</strong> ${data.plant_info.watering}
+        </div>
+      ` : ''}
+      ${data.plant_info.sunlight ? `
+        <div class="care-item">
+          <strong>Luz solar:</strong> ${data.plant_info.sunlight}
+        </div>
+      ` : ''}
+      <button onclick="searchGenericCare('${data.query}')" class="btn btn-pink mt-3">
+        <i class="bi bi-search"></i> Buscar cuidados genéricos
+      </button>
+    `;
+  } else {
+    plantCareElement.innerHTML = `
+      <div class="alert alert-info">
+        <i class="bi bi-info-circle"></i> No encontramos información de cuidados específicos. 
+        <button onclick="searchGenericCare('${data.query}')" class="btn btn-sm btn-pink ms-2">
+          Buscar cuidados genéricos
+        </button>
+      </div>
+    `;
+  }
+
+
+  const apiBadgesElement = document.getElementById('api-badges');
+  apiBadgesElement.innerHTML = '<small class="text-muted">Fuentes de información: </small>';
+
+  if (data.sources?.perenual === true) {
+    apiBadgesElement.innerHTML += '<span class="badge bg-pink api-badge">Perenual</span>';
+  }
+  if (data.sources?.pixabay === true) {
+    apiBadgesElement.innerHTML += '<span class="badge bg-primary api-badge">Pixabay</span>';
+  }
+  if (data.sources?.unsplash === true) {
+    apiBadgesElement.innerHTML += '<span class="badge bg-info text-dark api-badge">Unsplash</span>';
+  }
+  if (data.sources?.wikipedia === true) {
+    apiBadgesElement.innerHTML += '<span class="badge bg-warning text-dark api-badge">Wikipedia</span>';
+  }
+
+  if (!data.sources || Object.values(data.sources).every(val => val !== true)) {
+    apiBadgesElement.innerHTML = '<small class="text-muted">No se identificaron fuentes específicas</small>';
+  }
+
+  resultsElement.style.display = 'block';
+}
+
+window.searchGenericCare = function(flowerName) {
+
+  const genericCare = {
+    'alcatraz': {
+      watering: 'Mantener la tierra húmeda (no encharcada) especialmente durante crecimiento activo',
+      sunlight: 'Luz indirecta brillante o sol filtrado',
+      temperature: '18-24°C (no tolera heladas)',
+      tips: 'Proteger del frío en invierno y reducir riego en época de reposo'
+    },
+    'rosa': {
+      watering: 'Riego profundo 2-3 veces por semana, evitando mojar las hojas',
+      sunlight: 'Sol directo (al menos 6 horas diarias)',
+      temperature: '15-28°C',
+      tips: 'Podar a finales de invierno para estimular floración'
+    },
+    'orquídea': {
+      watering: 'Riego por inmersión cada 7-10 días, dejar escurrir completamente',
+      sunlight: 'Luz brillante indirecta',
+      temperature: '18-26°C',
+      tips: 'Usar maceta transparente para permitir fotosíntesis en raíces'
+    }
+  };
+
+  const normalizedName = flowerName.toLowerCase();
+  const careData = genericCare[normalizedName] || {
+    watering: 'Riego moderado cuando el suelo se sienta seco al tacto',
+    sunlight: 'Luz indirecta brillante o sol parcial',
+    temperature: 'Temperatura ambiente (15-25°C)',
+    tips: 'Evitar corrientes de aire y cambios bruscos de temperatura'
+  };
+
+
+  document.getElementById('plant-care').innerHTML = `
+    <div class="alert alert-warning mb-3">
+      <i class="bi bi-exclamation-triangle"></i> Cuidados genéricos para ${flowerName}
+    </div>
+    <div class="care-item d-flex align-items-start">
+      <span class="care-icon"><i class="bi bi-droplet"></i></span>
+      <div>
+        <strong>Riego:</strong> ${careData.watering}
+      </div>
+    </div>
+    <div class="care-item d-flex align-items-start">
+      <span class="care-icon"><i class="bi bi-brightness-high"></i></span>
+      <div>
+        <strong>Luz solar:</strong> ${careData.sunlight}
+      </div>
+    </div>
+    <div class="care-item d-flex align-items-start">
+      <span class="care-icon"><i class="bi bi-thermometer-half"></i></span>
+      <div>
+        <strong>Temperatura ideal:</strong> ${careData.temperature}
+      </div>
+    </div>
+    ${careData.tips ? `
+      <div class="alert alert-info mt-3">
+        <i class="bi bi-lightbulb"></i> <strong>Consejo:</strong> ${careData.tips}
+      </div>
+    ` : ''}
+  `;
+};
+
+
+function showError(message, suggestions = []) {
+  const errorElement = document.getElementById('error');
+  const errorMessage = document.getElementById('error-message');
+  const suggestionsElement = document.getElementById('error-suggestions');
+
+  errorMessage.innerHTML = message;
+
+  if (suggestions.length > 0) {
+    suggestionsElement.innerHTML = `
+      <div class="mt-3">
+        <p class="mb-2">Quizás quisiste decir:</p>
+        <div class="d-flex flex-wrap justify-content-center gap-2">
+          ${suggestions.map(flower => `
+            <span class="suggestion-chip" 
+                  onclick="document.getElementById('flower-search').value='${flower}';searchFlower()">
+              ${flower}
+            </span>
+          `).join('')}
+        </div>
+      </div>`;
+  } else {
+    suggestionsElement.innerHTML = '';
+  }
+
+  errorElement.style.display = 'block';
+
+
+  errorElement.scrollIntoView({ behavior: 'smooth', block: 'center' });
+}
+
+
+function resetUI() {
+  document.getElementById('loading').style.display = 'none';
+  document.getElementById('results').style.display = 'none';
+  document.getElementById('error').style.display = 'none';
+}
+
+
+window.showImageModal = function(imgUrl, title) {
+  document.getElementById('modal-image').src = imgUrl;
+  document.getElementById('modal-title').textContent = title;
+  new bootstrap.Modal(document.getElementById('imageModal')).show();
+};
+
+
+document.addEventListener('DOMContentLoaded', function() {
+  showInitialSuggestions();
+  initFloristMap();
+
+  document.getElementById('search-btn').addEventListener('click', searchFlower);
+  document.getElementById('flower-search').addEventListener('keypress', function(e) {
+    if (e.key === 'Enter') searchFlower();
+  });
+  document.getElementById('flower-search').addEventListener('input', loadSuggestions);
+});
+
+
+let suggestTimer = null;
+let suggestController = null;
+
+function loadSuggestions() {
+  const query = this.value.trim();
+  const suggestionList = document.getElementById('flower-suggestions');
+
+  clearTimeout(suggestTimer);
+  if (query.length < 2) {
+    suggestionList.innerHTML = '';
+    return;
+  }
+
+  suggestTimer = setTimeout(async () => {
+    if (suggestController) suggestController.abort();
+    suggestController = new AbortController();
+
+    try {
+      const response = await fetch(`/suggest?q=${encodeURIComponent(query)}`, {
+        signal: suggestController.signal
+      });
+      if (!response.ok) return;
+
+      const data = await response.json();
+      suggestionList.innerHTML = data.suggestions
+        .map(flower => `<option value="${flower}"></option>`)
+        .join('');
+    } catch (error) {
+      // Petición cancelada por una tecla posterior
+    }
+  }, 120);
+}
@@ -0,0 +1,37 @@
+"""
+Equivalencia del matcher precompilado con la implementación anterior.
+
+Reutiliza el corpus y las funciones de referencia de bench/bench_matcher.py,
+así que la comprobación corre con pytest y no solo como código de salida
+del benchmark.
+
+Uso (desde "flores mashup"):
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench"))
+
+import bench_matcher  # noqa: E402
+from bench_matcher import bloomhub  # noqa: E402
+
+CORPUS = bench_matcher.build_corpus()
+
+
+def test_corpus_covers_keywords_and_long_texts():
+    assert len(CORPUS) >= 700
+    assert set(bloomhub.FLOWER_KEYWORDS) <= set(CORPUS)
+    assert bench_matcher.LONG_SUMMARY in CORPUS
+
+
+@pytest.mark.parametrize("text", CORPUS, ids=lambda text: repr(text[:30]))
+def test_is_flower_related_matches_legacy(text):
+    assert bloomhub.is_flower_related(text) == bench_matcher.legacy_is_flower_related(text)
+
+
+@pytest.mark.parametrize("text", CORPUS, ids=lambda text: repr(text[:30]))
+def test_normalize_flower_name_matches_legacy(text):
+    assert bloomhub.normalize_flower_name(text) == bench_matcher.legacy_normalize_flower_name(text)
@@ -0,0 +1,13 @@
+"""
+Punto de entrada para servidores WSGI en producción.
+
+    gunicorn --preload -w 4 -b 0.0.0.0:8000 wsgi:app
+
+Con --preload el proceso maestro importa la app y ejecuta prewarm() una sola
+vez; los workers heredan módulos, plantillas y tablas ya preparados.
+"""
+import os
+
+from app import create_app
+
+app = create_app(os.getenv("APP_MODE", "production"))